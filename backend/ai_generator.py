@@ -1,7 +1,8 @@
 import os
-import requests
 import json
 from dotenv import load_dotenv
+from openai_http import get_openai_http
+from placeholder_resolvers import resolvers
 
 # Load environment variables
 load_dotenv()
@@ -9,75 +10,169 @@ load_dotenv()
 # Get API key from environment variables
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-def generate_placeholder_content(placeholder, recipient_email, template_name):
-    """Generate content for a placeholder using AI."""
-    if not OPENAI_API_KEY:
-        raise Exception("OpenAI API key not found in environment variables")
-    
-    # Extract domain from email for company research
+# Personal email providers; their domains say nothing about the recipient's company
+GENERIC_EMAIL_DOMAINS = {"gmail.com", "hotmail.com", "outlook.com", "yahoo.com"}
+
+GENERATION_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a helpful assistant that generates concise, professional email content. Respond only with the exact text requested without any additional commentary, explanations, or quotation marks."
+BATCH_SYSTEM_PROMPT = "You are a helpful assistant that generates concise, professional email content. Respond only with a JSON object mapping each requested key to the exact text for it, without any additional commentary, explanations, or quotation marks inside the values."
+
+# Longest value accepted from a batched response before falling back to a single request
+MAX_PLACEHOLDER_LENGTH = 300
+
+
+def recipient_company(recipient_email):
+    """Return (domain, company_name) guessed from a recipient's email address."""
     domain = recipient_email.split('@')[-1] if '@' in recipient_email else None
     company_name = domain.split('.')[0].capitalize() if domain else "the company"
-    
-    # Create specific prompts based on placeholder type
+    return domain, company_name
+
+
+def build_placeholder_prompt(placeholder, domain, company_name):
+    """The instruction used to generate one placeholder's content."""
+    is_business_domain = bool(domain) and domain not in GENERIC_EMAIL_DOMAINS
     if placeholder == "specific achievement or aspect of their business":
-        if domain and domain != "gmail.com" and domain != "hotmail.com" and domain != "outlook.com" and domain != "yahoo.com":
+        if is_business_domain:
             # For business domains, create a prompt about their core business
-            prompt = f"Based on the company name '{company_name}' from domain '{domain}', what is likely their main business focus or value proposition? Provide a brief, specific description of what problem they likely solve for customers. Keep it concise (25 words or less)."
-        else:
-            # For generic emails, create a generic placeholder
-            prompt = "Generate a generic business value proposition that would be impressive to mention in a cold email (25 words or less)."
-    elif placeholder == "Industry":
-        if domain and domain != "gmail.com" and domain != "hotmail.com" and domain != "outlook.com" and domain != "yahoo.com":
-            prompt = f"Based on the company name '{company_name}' from domain '{domain}', what industry is this company likely in? Respond with just the industry name."
-        else:
-            prompt = "Generate a specific industry name that would be relevant for B2B sales outreach. Respond with just the industry name."
-    elif placeholder == "specific dates/times":
-        prompt = "Suggest 3 professional meeting time slots for next week. Format as 'Tuesday at 10 AM ET, Wednesday at 3 PM ET, Thursday at 1 PM ET'. Respond with just the formatted time slots."
-    else:
-        # General fallback prompt for other placeholders
-        prompt = f"Generate appropriate content for the placeholder '{placeholder}' in a professional email. Keep it concise, specific, and realistic. Respond with just the content for the placeholder."
+            return f"Based on the company name '{company_name}' from domain '{domain}', what is likely their main business focus or value proposition? Provide a brief, specific description of what problem they likely solve for customers. Keep it concise (25 words or less)."
+        # For generic emails, create a generic placeholder
+        return "Generate a generic business value proposition that would be impressive to mention in a cold email (25 words or less)."
+    if placeholder == "Industry":
+        if is_business_domain:
+            return f"Based on the company name '{company_name}' from domain '{domain}', what industry is this company likely in? Respond with just the industry name."
+        return "Generate a specific industry name that would be relevant for B2B sales outreach. Respond with just the industry name."
+    if placeholder == "specific dates/times":
+        return "Suggest 3 professional meeting time slots for next week. Format as 'Tuesday at 10 AM ET, Wednesday at 3 PM ET, Thursday at 1 PM ET'. Respond with just the formatted time slots."
+    # General fallback prompt for other placeholders
+    return f"Generate appropriate content for the placeholder '{placeholder}' in a professional email. Keep it concise, specific, and realistic. Respond with just the content for the placeholder."
+
+
+def fallback_content(placeholder, company_name):
+    """Value used when generation fails."""
+    fallbacks = {
+        "specific achievement or aspect of their business": f"innovative solutions in the {company_name} sector",
+        "Industry": "Technology",
+        "specific dates/times": "Tuesday at 10 AM ET, Wednesday at 3 PM ET, Thursday at 1 PM ET"
+    }
+    # Return fallback or sanitized placeholder
+    return fallbacks.get(placeholder, f"[{placeholder}]")
+
+
+def clean_content(content):
+    # Remove any quotes that might be in the response
+    return content.strip().replace('"', '').replace("'", "")
+
+
+def chat_completion(messages, max_tokens, call, domain=None, **options):
+    """Send a chat completion request and return the reply text."""
+    result = get_openai_http().chat_completion({
+        "model": GENERATION_MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        **options
+    }, call=call, domain=domain)
+
+    # Parse response
+    if "choices" in result and len(result["choices"]) > 0:
+        return result["choices"][0]["message"]["content"]
+    print(f"API Error: {result}")
+    raise Exception("Invalid response from OpenAI API")
+
+
+def generate_placeholder_content(placeholder, recipient_email, template_name):
+    """Generate content for a placeholder, locally when a resolver can, otherwise using AI."""
+    resolved = resolvers.resolve(placeholder, recipient_email)
+    if resolved:
+        return resolved
+
+    if not OPENAI_API_KEY:
+        raise Exception("OpenAI API key not found in environment variables")
+
+    domain, company_name = recipient_company(recipient_email)
+    prompt = build_placeholder_prompt(placeholder, domain, company_name)
 
     try:
-        # Call OpenAI API
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant that generates concise, professional email content. Respond only with the exact text requested without any additional commentary, explanations, or quotation marks."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 50,
-                "temperature": 0.7
-            }
+        content = chat_completion(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=50,
+            call="placeholder",
+            domain=domain
         )
-        
-        # Parse response
-        result = response.json()
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"].strip()
-            
-            # Remove any quotes that might be in the response
-            content = content.replace('"', '').replace("'", "")
-            
-            return content
-        else:
-            print(f"API Error: {result}")
-            raise Exception("Invalid response from OpenAI API")
-            
+        return clean_content(content)
     except Exception as e:
         print(f"Generation error: {str(e)}")
-        
         # Return fallback values if API call fails
-        fallbacks = {
-            "specific achievement or aspect of their business": f"innovative solutions in the {company_name} sector",
-            "Industry": "Technology",
-            "specific dates/times": "Tuesday at 10 AM ET, Wednesday at 3 PM ET, Thursday at 1 PM ET"
-        }
-        
-        # Return fallback or sanitized placeholder
-        return fallbacks.get(placeholder, f"[{placeholder}]") 
\ No newline at end of file
+        return fallback_content(placeholder, company_name)
+
+
+def is_valid_content(placeholder, value):
+    """Whether a value from a batched response can be used for the placeholder."""
+    if not isinstance(value, str):
+        return False
+    value = value.strip()
+    return bool(value) and len(value) <= MAX_PLACEHOLDER_LENGTH and f"[{placeholder}]" not in value
+
+
+def generate_placeholders_content(placeholders, recipient_email, template_name):
+    """
+    Generate content for all of a template's placeholders with one AI request.
+
+    The model is asked for a JSON object with one key per placeholder, each
+    described by the same instruction a single request would use. Keys that
+    are missing or unusable in the reply are generated one at a time with
+    generate_placeholder_content, so the result always covers every
+    placeholder. Placeholders a local resolver can answer are never sent.
+    """
+    contents = {}
+    for placeholder in dict.fromkeys(placeholders):
+        resolved = resolvers.resolve(placeholder, recipient_email)
+        if resolved:
+            contents[placeholder] = resolved
+    placeholders = [placeholder for placeholder in dict.fromkeys(placeholders) if placeholder not in contents]
+    if not placeholders:
+        return contents
+
+    if not OPENAI_API_KEY:
+        raise Exception("OpenAI API key not found in environment variables")
+    domain, company_name = recipient_company(recipient_email)
+    instructions = {
+        placeholder: build_placeholder_prompt(placeholder, domain, company_name)
+        for placeholder in placeholders
+    }
+    prompt = (
+        f"Generate content for the placeholders of the '{template_name}' email template. "
+        "Return a JSON object with exactly these keys, where each value is the text described:\n"
+        + json.dumps(instructions, indent=2)
+    )
+
+    generated = {}
+    try:
+        content = chat_completion(
+            [
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            # Room for the same 50 tokens per value a single request gets, plus the JSON keys
+            max_tokens=80 * len(placeholders),
+            call="placeholders_batch",
+            domain=domain,
+            response_format={"type": "json_object"}
+        )
+        generated = json.loads(content)
+        if not isinstance(generated, dict):
+            raise ValueError("Batched response is not a JSON object")
+    except Exception as e:
+        print(f"Batched generation error: {str(e)}")
+        generated = {}
+
+    for placeholder in placeholders:
+        value = generated.get(placeholder)
+        if is_valid_content(placeholder, value):
+            contents[placeholder] = clean_content(value)
+        else:
+            contents[placeholder] = generate_placeholder_content(placeholder, recipient_email, template_name)
+    return contents
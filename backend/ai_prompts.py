@@ -1,5 +1,40 @@
-from openai import OpenAI
-from typing import Dict, Any
+from openai import AsyncOpenAI
+from typing import Dict, Any, List, Optional
+from analysis_cache import AnalysisCache, FRESH, STALE
+from domains import normalize_domain
+from metrics import ANALYSIS_PIPELINE_SECONDS, observe_llm_call
+from prompt_budget import SEARCH_RESULTS_TOKEN_BUDGET, TokenBudgetExceeded, count_tokens, ledger, trim_to_budget
+from single_flight import SingleFlight
+import json
+import os
+import time
+
+# "two_call" asks for the industry and the analysis in one structured call;
+# "three_call" runs the separate industry extraction call first
+ANALYSIS_PIPELINE = os.getenv('ANALYSIS_PIPELINE', 'two_call')
+PIPELINE_MODES = ("two_call", "three_call")
+
+# Shared across requests so connections to the API are pooled and reused
+_async_client: Optional[AsyncOpenAI] = None
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI()
+    return _async_client
+
+# Completed analyses, keyed on normalized domain
+analysis_cache = AnalysisCache("company_analysis")
+# Concurrent analyses of the same domain share one in-flight pipeline
+analysis_flights = SingleFlight()
+
+async def close_async_client() -> None:
+    """Close the shared client and its connection pool."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
 
 def get_company_search_prompt(domain: str) -> Dict[str, Any]:
     return {
@@ -56,60 +91,253 @@ Keep each focus area specific and actionable, highlighting industry-specific asp
 Only include factual information found in the search results."""
     }
 
-def analyze_company(domain: str) -> Dict[str, Any]:
+# Fields of the structured analysis, in the order and with the keys
+# parse_structured_response produces for the text format
+ANALYSIS_FIELDS = [
+    ("company_name", "Full company name"),
+    ("industry", "Primary industry, in lower case only"),
+    ("design_focus", "One specific, industry-relevant UI/UX improvement suggestion in one small sentence"),
+    ("development_focus", "One specific, industry-relevant technical improvement suggestion in one small sentence"),
+    ("ai_integration_focus", "One specific, industry-relevant AI feature suggestion in one small sentence"),
+    ("business_focus", "Main business objectives and goals in one small sentence"),
+    ("key_achievements", "List of major achievements and milestones in one small sentence"),
+    ("market_position", "Current market position and competitive advantages in one small sentence"),
+    ("products_summary", "Overview of main products/services in one small sentence"),
+    ("company_values", "Core values and mission statement in one small sentence"),
+    ("description", "Brief company description and main business in one small sentence"),
+]
+
+def get_structured_analysis_prompt(domain: str, search_results: str) -> Dict[str, Any]:
+    """The industry and the full analysis in one call, returned as JSON matching a schema."""
+    return {
+        "model": "gpt-4o",
+        "tools": [{"type": "web_search_preview"}],
+        "input": f"""Based on the search results about {domain}, identify their primary industry and provide a detailed analysis.
+
+Search results:
+{search_results}
+
+Keep each focus area specific and actionable, highlighting industry-specific aspects.
+Only include factual information found in the search results.""",
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "company_analysis",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        key: {"type": "string", "description": description}
+                        for key, description in ANALYSIS_FIELDS
+                    },
+                    "required": [key for key, _ in ANALYSIS_FIELDS],
+                    "additionalProperties": False
+                }
+            }
+        }
+    }
+
+class PipelineStats:
+    """Latency and token use of analysis pipeline runs, per pipeline mode."""
+
+    def __init__(self):
+        self.modes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, mode: str, usage: Dict[str, Any]) -> None:
+        totals = self.modes.setdefault(mode, {
+            "runs": 0, "calls": 0, "latency_ms": 0, "input_tokens": 0, "output_tokens": 0
+        })
+        totals["runs"] += 1
+        for key in ("calls", "latency_ms", "input_tokens", "output_tokens"):
+            totals[key] += usage[key]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            mode: {
+                **totals,
+                "mean_latency_ms": round(totals["latency_ms"] / totals["runs"]),
+                "mean_input_tokens": round(totals["input_tokens"] / totals["runs"]),
+                "mean_output_tokens": round(totals["output_tokens"] / totals["runs"])
+            }
+            for mode, totals in self.modes.items()
+        }
+
+pipeline_stats = PipelineStats()
+
+def get_pipeline_stats() -> Dict[str, Dict[str, float]]:
+    """Per-mode latency and token totals for analyses run in this process."""
+    return pipeline_stats.stats()
+
+async def analyze_company(domain: str) -> Dict[str, Any]:
+    """
+    Analyze a company, serving cached results when available.
+
+    Fresh cache entries are returned directly. In stale-while-revalidate mode
+    an expired entry is returned right away and refreshed in the background.
+    Only analyses that completed without falling back to defaults are cached.
+    Concurrent calls for the same domain share a single pipeline run.
+    """
+    key = normalize_domain(domain)
+    cached, state = analysis_cache.lookup(key)
+
+    if state == FRESH:
+        print(f"Analysis cache hit for {key}")
+        return cached
+
+    if state == STALE:
+        print(f"Serving stale analysis for {key}, refreshing in background")
+        if not analysis_flights.in_flight(key):
+            analysis_cache.refreshes += 1
+            analysis_flights.start(key, lambda: _analyze_and_store(key))
+        return cached
+
+    return await analysis_flights.do(key, lambda: _analyze_and_store(key))
+
+async def _analyze_and_store(key: str) -> Dict[str, Any]:
+    result = await run_company_analysis(key)
+    if result.get("success") and not result.get("fallbacks"):
+        analysis_cache.set(key, result)
+    return result
+
+def default_analysis(domain: str, industry: str) -> Dict[str, Any]:
+    """Structured data used when the analysis call fails."""
+    domain_name = domain.split('.')[0].capitalize()
+    return {
+        "company_name": domain_name,
+        "industry": industry,
+        "business_focus": "digital transformation and growth",
+        "design_focus": "UI/UX optimization for improved user engagement",
+        "development_focus": "Scalable, AI-powered architecture",
+        "ai_integration_focus": "Custom AI solutions for automation and efficiency",
+        "description": f"{domain_name} provides innovative solutions in the {industry} industry."
+    }
+
+async def _create_response(client: AsyncOpenAI, usage: Dict[str, Any], prompt: Dict[str, Any],
+                           call: str, domain: str):
+    """Make one Responses API call, enforcing the domain's token ceiling and recording its token use."""
+    started = time.monotonic()
+    try:
+        if ledger.ceiling:
+            ledger.check(domain, count_tokens(prompt["input"]))
+        response = await client.responses.create(**prompt)
+    except TokenBudgetExceeded:
+        observe_llm_call(call, prompt["model"], "over_budget", time.monotonic() - started)
+        raise
+    except Exception:
+        observe_llm_call(call, prompt["model"], "error", time.monotonic() - started)
+        raise
+    usage["calls"] += 1
+    sent = received = 0
+    if response.usage:
+        sent, received = response.usage.input_tokens, response.usage.output_tokens
+        usage["input_tokens"] += sent
+        usage["output_tokens"] += received
+    ledger.record(call, domain, sent, received)
+    observe_llm_call(call, prompt["model"], "success", time.monotonic() - started, sent, received)
+    return response
+
+async def run_company_analysis(domain: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the analysis pipeline for a domain, bypassing the cache.
+
+    In "two_call" mode (the default, see ANALYSIS_PIPELINE) the search is
+    followed by one structured-output call that returns the industry along
+    with the analysis. "three_call" mode runs search -> industry extraction
+    -> analysis. The result's "pipeline" entry records the mode, number of
+    calls, latency and tokens used. A domain over its token ceiling fails the run instead of falling back.
+    """
+    mode = mode or ANALYSIS_PIPELINE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown analysis pipeline {mode}, expected one of {', '.join(PIPELINE_MODES)}")
+    fallbacks: List[str] = []
+    usage = {"mode": mode, "calls": 0, "latency_ms": 0, "input_tokens": 0, "output_tokens": 0}
+    started = time.monotonic()
     try:
-        client = OpenAI()
+        ledger.check(domain)
+        client = get_async_client()
         
         # First, search for the company website and industry
         print(f"Starting company search for domain: {domain}")
         try:
-            search_response = client.responses.create(**get_company_search_prompt(domain))
-            search_results = search_response.output_text
+            search_response = await _create_response(client, usage, get_company_search_prompt(domain), "company_search", domain)
+            search_results = trim_to_budget(search_response.output_text, SEARCH_RESULTS_TOKEN_BUDGET)
             print(f"Search successful for {domain}")
+        except TokenBudgetExceeded:
+            raise
         except Exception as search_error:
             print(f"Search failed for {domain}: {str(search_error)}")
             # Provide default search results to continue processing
+            fallbacks.append("search")
             search_results = f"Company {domain} appears to be in the technology industry. They likely provide digital solutions and services."
         
-        # Extract industry
-        try:
-            industry_response = client.responses.create(**get_industry_extraction_prompt(domain, search_results))
-            industry = industry_response.output_text.strip()
-            print(f"Industry extracted for {domain}: {industry}")
-        except Exception as industry_error:
-            print(f"Industry extraction failed for {domain}: {str(industry_error)}")
-            industry = "technology"
-        
-        # Analyze the search results with industry-specific focus
-        try:
-            analysis_response = client.responses.create(**get_company_analysis_prompt(domain, industry, search_results))
-            structured_data = parse_structured_response(analysis_response.output_text)
-            print(f"Analysis successful for {domain}")
-        except Exception as analysis_error:
-            print(f"Analysis failed for {domain}: {str(analysis_error)}")
-            # Provide default structured data
-            domain_name = domain.split('.')[0].capitalize()
-            structured_data = {
-                "company_name": domain_name,
-                "industry": industry,
-                "business_focus": "digital transformation and growth",
-                "design_focus": "UI/UX optimization for improved user engagement",
-                "development_focus": "Scalable, AI-powered architecture",
-                "ai_integration_focus": "Custom AI solutions for automation and efficiency",
-                "description": f"{domain_name} provides innovative solutions in the {industry} industry."
-            }
+        if mode == "two_call":
+            structured_data = await _run_structured_analysis(client, usage, domain, search_results, fallbacks)
+        else:
+            structured_data = await _run_industry_then_analysis(client, usage, domain, search_results, fallbacks)
         
+        usage["latency_ms"] = round((time.monotonic() - started) * 1000)
+        pipeline_stats.record(mode, usage)
+        ANALYSIS_PIPELINE_SECONDS.labels(
+            mode, "fallback" if fallbacks else "success", ','.join(fallbacks) or "none"
+        ).observe(time.monotonic() - started)
         return {
             "success": True,
-            "searchData": structured_data
+            "searchData": structured_data,
+            "fallbacks": fallbacks,
+            "pipeline": usage
         }
     except Exception as e:
         print(f"Overall analysis failed for {domain}: {str(e)}")
+        ANALYSIS_PIPELINE_SECONDS.labels(mode, "failed", ','.join(fallbacks) or "none").observe(time.monotonic() - started)
         return {
             "success": False,
             "error": str(e)
         }
 
+async def _run_structured_analysis(client: AsyncOpenAI, usage: Dict[str, Any], domain: str,
+                                   search_results: str, fallbacks: List[str]) -> Dict[str, Any]:
+    """Get the industry and the analysis from one structured-output call."""
+    try:
+        analysis_response = await _create_response(client, usage, get_structured_analysis_prompt(domain, search_results), "structured_analysis", domain)
+        structured_data = json.loads(analysis_response.output_text)
+        structured_data["industry"] = (structured_data.get("industry") or "technology").strip().lower()
+        print(f"Analysis successful for {domain} (industry: {structured_data['industry']})")
+        return structured_data
+    except TokenBudgetExceeded:
+        raise
+    except Exception as analysis_error:
+        print(f"Analysis failed for {domain}: {str(analysis_error)}")
+        fallbacks.extend(["industry", "analysis"])
+        return default_analysis(domain, "technology")
+
+async def _run_industry_then_analysis(client: AsyncOpenAI, usage: Dict[str, Any], domain: str,
+                                      search_results: str, fallbacks: List[str]) -> Dict[str, Any]:
+    """Extract the industry, then analyze the search results with it."""
+    try:
+        industry_response = await _create_response(client, usage, get_industry_extraction_prompt(domain, search_results), "industry_extraction", domain)
+        industry = industry_response.output_text.strip()
+        print(f"Industry extracted for {domain}: {industry}")
+    except TokenBudgetExceeded:
+        raise
+    except Exception as industry_error:
+        print(f"Industry extraction failed for {domain}: {str(industry_error)}")
+        fallbacks.append("industry")
+        industry = "technology"
+    
+    # Analyze the search results with industry-specific focus
+    try:
+        analysis_response = await _create_response(client, usage, get_company_analysis_prompt(domain, industry, search_results), "company_analysis", domain)
+        structured_data = parse_structured_response(analysis_response.output_text)
+        print(f"Analysis successful for {domain}")
+        return structured_data
+    except TokenBudgetExceeded:
+        raise
+    except Exception as analysis_error:
+        print(f"Analysis failed for {domain}: {str(analysis_error)}")
+        # Provide default structured data
+        fallbacks.append("analysis")
+        return default_analysis(domain, industry)
+
 def parse_structured_response(text: str) -> Dict[str, Any]:
     """Parse the structured response into a dictionary."""
     result = {}
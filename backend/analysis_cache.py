@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Where cached company records are stored and how long they stay fresh
+CACHE_PATH = os.getenv('ANALYSIS_CACHE_PATH', 'analysis_cache.db')
+CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', str(7 * 24 * 3600)))
+# Serve expired records immediately and refresh them in the background
+STALE_WHILE_REVALIDATE = os.getenv('ANALYSIS_CACHE_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+# Records older than this are never served, even in stale-while-revalidate mode
+MAX_STALE = float(os.getenv('ANALYSIS_CACHE_MAX_STALE', str(30 * 24 * 3600)))
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+_caches: List["AnalysisCache"] = []
+
+
+class AnalysisCache:
+    """
+    Disk-backed cache of company records keyed on normalized domain.
+
+    Records live in a SQLite database in WAL mode so several worker processes
+    can read while one writes. Each namespace (e.g. 'company_analysis',
+    'company_info') is a separate logical cache within the same file.
+    """
+
+    def __init__(self, namespace: str, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 stale_while_revalidate: bool = STALE_WHILE_REVALIDATE, max_stale: float = MAX_STALE):
+        self.namespace = namespace
+        self.path = path
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_stale = max_stale
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        _caches.append(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Look up a record and classify it.
+
+        Returns (value, state) where state is FRESH, STALE or MISS. STALE is
+        only returned in stale-while-revalidate mode; the caller is expected
+        to serve the value and schedule a refresh.
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, updated_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row:
+                age = time.time() - row[1]
+                if age < self.ttl:
+                    self.hits += 1
+                    return json.loads(row[0]), FRESH
+                if self.stale_while_revalidate and age < self.max_stale:
+                    self.stale_hits += 1
+                    return json.loads(row[0]), STALE
+
+            self.misses += 1
+            return None, MISS
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a record that could still be served, without touching the counters."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, updated_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        if not row:
+            return None
+        age = time.time() - row[1]
+        max_age = self.max_stale if self.stale_while_revalidate else self.ttl
+        return json.loads(row[0]) if age < max(self.ttl, max_age) else None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a record, replacing any previous one for the key."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time())
+            )
+            conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "ttl": self.ttl,
+            "stale_while_revalidate": self.stale_while_revalidate
+        }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters for every cache created in this process."""
+    return {cache.namespace: cache.stats() for cache in _caches}
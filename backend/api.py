@@ -1,18 +1,53 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, conint
+from typing import Dict, List, Optional
 import gmail_integration
 import ai_generator  # New import for AI functionality
 import web_scraper  # New import for web scraping functionality
+import campaign_jobs
 from email_refiner import refine_email_content
 from company_analyzer import enhance_company_data
-from ai_prompts import analyze_company
+from ai_prompts import analyze_company, close_async_client, get_pipeline_stats
+from openai_http import close_openai_http
+from page_fetcher import close_fetcher, get_fetcher
+from domains import normalize_domain
+from analysis_cache import get_cache_stats
+from prompt_budget import ledger, load_tokenizer
+from metrics import render_metrics
+from single_flight import SingleFlight
+from functools import partial
+import asyncio
+import json
 import os
 import tempfile
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    # Load the tokenizer off the event loop; token counts are estimated until it's ready
+    asyncio.get_running_loop().run_in_executor(None, load_tokenizer)
+    # Pick up campaign jobs interrupted by a restart or crash
+    campaign_jobs.start_workers()
+    campaign_jobs.resume_jobs()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await campaign_jobs.stop_workers()
+    await close_async_client()
+    await close_fetcher()
+    close_openai_http()
+
+# Concurrent requests for the same (placeholder, domain) share one generation
+placeholder_flights = SingleFlight()
+
+# Default number of domains analyzed at once by /batch/analyze
+BATCH_ANALYZE_CONCURRENCY = int(os.getenv('BATCH_ANALYZE_CONCURRENCY', '8'))
+# Most analyses a single /batch/analyze request may ask to run at once
+MAX_BATCH_CONCURRENCY = int(os.getenv('MAX_BATCH_CONCURRENCY', '32'))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,15 +67,42 @@ class AIContentRequest(BaseModel):
     recipient_email: str
     template_name: str
 
+class AIContentBatchRequest(BaseModel):
+    placeholders: List[str]
+    recipient_email: str
+    template_name: str
+
 class WebScrapingRequest(BaseModel):
     domain: str
 
+class BatchAnalyzeRequest(BaseModel):
+    domains: List[str]
+    concurrency: Optional[conint(ge=1, le=MAX_BATCH_CONCURRENCY)] = None
+
+class DraftItem(BaseModel):
+    recipient_email: str
+    subject: str
+    body: str
+
+class CreateDraftsRequest(BaseModel):
+    drafts: List[DraftItem]
+
+class CampaignJobRequest(BaseModel):
+    recipient_emails: List[str]
+    subject: str
+    body: str
+    user_name: str
+    user_company: str
+    create_drafts: bool = True
+    refine: bool = False
+
 class RefineEmailRequest(BaseModel):
     subject: str
     body: str
     recipient_email: str
     industry: Optional[str] = None
     company_name: Optional[str] = None
+    force: bool = False
 
 @app.post("/create-draft")
 async def create_draft(
@@ -50,8 +112,9 @@ async def create_draft(
     attachment: Optional[UploadFile] = File(None)
 ):
     try:
-        # Check if authenticated, if not, get auth URL
-        if not gmail_integration.check_auth():
+        loop = asyncio.get_running_loop()
+        # Check if authenticated, if not, get auth URL (loading credentials blocks, so off the event loop)
+        if not await loop.run_in_executor(None, gmail_integration.check_auth):
             auth_url = gmail_integration.get_authorization_url()
             return {"success": False, "auth_required": True, "auth_url": auth_url}
         
@@ -64,13 +127,14 @@ async def create_draft(
                 temp_file.write(content)
                 attachment_path = temp_file.name
         
-        # Create the draft with attachment
-        draft_id = gmail_integration.create_draft(
+        # Create the draft with attachment, running the blocking API call off the event loop
+        draft_id = await loop.run_in_executor(None, partial(
+            gmail_integration.create_draft,
             recipient_email=recipient_email,
             subject=subject,
             body=body,
             attachment_path=attachment_path
-        )
+        ))
         
         # Clean up temporary file if it exists
         if attachment_path and os.path.exists(attachment_path):
@@ -83,23 +147,79 @@ async def create_draft(
             os.unlink(attachment_path)
         raise HTTPException(status_code=500, detail=f"Failed to create draft: {str(e)}")
 
+@app.post("/create-drafts")
+async def create_drafts(request: CreateDraftsRequest):
+    try:
+        loop = asyncio.get_running_loop()
+        # Check if authenticated, if not, get auth URL (loading credentials blocks, so off the event loop)
+        if not await loop.run_in_executor(None, gmail_integration.check_auth):
+            auth_url = gmail_integration.get_authorization_url()
+            return {"success": False, "auth_required": True, "auth_url": auth_url}
+        
+        drafts = [draft.dict() for draft in request.drafts]
+        # Run the blocking batch requests off the event loop
+        results = await loop.run_in_executor(None, gmail_integration.create_drafts, drafts)
+        
+        return {
+            "success": all(result["success"] for result in results),
+            "created": sum(1 for result in results if result["success"]),
+            "failed": sum(1 for result in results if not result["success"]),
+            "results": results
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create drafts: {str(e)}")
+
 @app.post("/generate-ai-content")
 async def generate_ai_content(request: AIContentRequest):
     try:
-        content = ai_generator.generate_placeholder_content(
+        loop = asyncio.get_running_loop()
+        key = (request.placeholder, normalize_domain(request.recipient_email))
+        generate = partial(
+            ai_generator.generate_placeholder_content,
             placeholder=request.placeholder,
             recipient_email=request.recipient_email,
             template_name=request.template_name
         )
+        # Run the blocking generator off the event loop
+        content = await placeholder_flights.do(key, lambda: loop.run_in_executor(None, generate))
         return {"success": True, "content": content}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate AI content: {str(e)}")
 
+@app.post("/generate-ai-content/batch")
+async def generate_ai_content_batch(request: AIContentBatchRequest):
+    """Generate every placeholder of a template with a single AI request."""
+    try:
+        loop = asyncio.get_running_loop()
+        generate = partial(
+            ai_generator.generate_placeholders_content,
+            placeholders=request.placeholders,
+            recipient_email=request.recipient_email,
+            template_name=request.template_name
+        )
+        # Run the blocking generator off the event loop
+        contents = await loop.run_in_executor(None, generate)
+        return {"success": True, "contents": contents}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate AI content: {str(e)}")
+
+def get_fallback_search_data(domain: str) -> dict:
+    """Default company data returned when analysis of a domain fails."""
+    return {
+        "company_name": domain.split('.')[0].capitalize(),
+        "industry": "technology",
+        "business_focus": "digital transformation and growth",
+        "design_focus": "UI/UX optimization for improved user engagement",
+        "development_focus": "Scalable, AI-powered architecture",
+        "ai_integration_focus": "Custom AI solutions for automation and efficiency",
+        "description": f"A company in the technology industry providing innovative solutions."
+    }
+
 @app.post("/scrape-website")
 async def scrape_website(request: WebScrapingRequest):
     try:
         print(f"Analyzing company: {request.domain}")
-        result = analyze_company(request.domain)
+        result = await analyze_company(request.domain)
         
         if not result.get("success"):
             print(f"Analysis failed for {request.domain}: {result.get('error', 'Unknown error')}")
@@ -107,15 +227,7 @@ async def scrape_website(request: WebScrapingRequest):
             return {
                 "success": False,
                 "error": result.get("error", "Failed to analyze company"),
-                "searchData": {
-                    "company_name": request.domain.split('.')[0].capitalize(),
-                    "industry": "technology",
-                    "business_focus": "digital transformation and growth",
-                    "design_focus": "UI/UX optimization for improved user engagement",
-                    "development_focus": "Scalable, AI-powered architecture",
-                    "ai_integration_focus": "Custom AI solutions for automation and efficiency",
-                    "description": f"A company in the technology industry providing innovative solutions."
-                }
+                "searchData": get_fallback_search_data(request.domain)
             }
         
         print(f"Analysis successful for {request.domain}")
@@ -126,43 +238,158 @@ async def scrape_website(request: WebScrapingRequest):
         return {
             "success": False,
             "error": str(e),
-            "searchData": {
-                "company_name": request.domain.split('.')[0].capitalize(),
-                "industry": "technology",
-                "business_focus": "digital transformation and growth",
-                "design_focus": "UI/UX optimization for improved user engagement",
-                "development_focus": "Scalable, AI-powered architecture",
-                "ai_integration_focus": "Custom AI solutions for automation and efficiency",
-                "description": f"A company in the technology industry providing innovative solutions."
-            }
+            "searchData": get_fallback_search_data(request.domain)
         }
 
+@app.post("/batch/analyze")
+async def batch_analyze(request: BatchAnalyzeRequest):
+    """
+    Analyze many domains at once and stream each result as soon as it finishes.
+
+    Domains are normalized and deduplicated, then analyzed with at most
+    `concurrency` analyses in flight. The response is newline-delimited JSON,
+    one object per domain, in completion order; each carries the normalized
+    `domain` and the `inputs` from the request that map to it.
+    """
+    inputs: Dict[str, List[str]] = {}
+    for original in request.domains:
+        if original.strip():
+            inputs.setdefault(normalize_domain(original), []).append(original)
+    domains = list(inputs)
+    concurrency = request.concurrency or max(1, min(BATCH_ANALYZE_CONCURRENCY, MAX_BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze_one(domain: str):
+        async with semaphore:
+            try:
+                result = await analyze_company(domain)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+        if not result.get("success"):
+            print(f"Batch analysis failed for {domain}: {result.get('error', 'Unknown error')}")
+            result = {
+                "success": False,
+                "error": result.get("error", "Failed to analyze company"),
+                "searchData": get_fallback_search_data(domain)
+            }
+        return {"domain": domain, "inputs": inputs[domain], **result}
+
+    async def stream_results():
+        tasks = [asyncio.ensure_future(analyze_one(domain)) for domain in domains]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # Stop outstanding analyses if the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+
+    print(f"Batch analyzing {len(domains)} domains with concurrency {concurrency}")
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.post("/refine-email")
 async def refine_email(request: RefineEmailRequest):
     try:
         print(f"Refining email for {request.company_name}")
         
-        result = refine_email_content(
+        loop = asyncio.get_running_loop()
+        refine = partial(
+            refine_email_content,
             request.subject,
             request.body,
             request.recipient_email,
             {
                 "industry": request.industry,
                 "company_name": request.company_name
-            }
+            },
+            force=request.force
         )
+        # Run the blocking refinement off the event loop
+        result = await loop.run_in_executor(None, refine)
         
-        print("Refinement completed successfully")
+        print("Refinement completed successfully" if result["refined"] else "Refinement skipped, email already clean")
         
         return {
             "success": True,
             "subject": result["subject"],
-            "body": result["body"]
+            "body": result["body"],
+            "refined": result["refined"],
+            "issues": result["issues"]
         }
     except Exception as e:
         print(f"Refinement failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs")
+async def create_job(request: CampaignJobRequest):
+    """
+    Start a batch campaign on the server and return its id right away.
+    
+    Progress is followed through GET /jobs/{job_id}/events; the job keeps
+    running if the client goes away and resumes after a server restart.
+    """
+    loop = asyncio.get_running_loop()
+    # Loading credentials blocks, so check them off the event loop
+    if request.create_drafts and not await loop.run_in_executor(None, gmail_integration.check_auth):
+        auth_url = gmail_integration.get_authorization_url()
+        return {"success": False, "auth_required": True, "auth_url": auth_url}
+    
+    job = campaign_jobs.start_job(
+        request.recipient_emails, request.subject, request.body,
+        request.user_name, request.user_company,
+        create_drafts=request.create_drafts, refine=request.refine
+    )
+    return {"success": True, "job_id": job.id, "domains": len(job.groups)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = campaign_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream a job's stage transitions as Server-Sent Events, resuming after Last-Event-ID."""
+    job = campaign_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    try:
+        after = int(last_event_id) if last_event_id is not None else -1
+    except ValueError:
+        after = -1
+    return StreamingResponse(
+        campaign_jobs.stream_events(job, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/analysis/stats")
+async def analysis_stats():
+    """Latency and token use of company analyses per pipeline mode."""
+    return get_pipeline_stats()
+
+@app.get("/usage/tokens")
+async def token_usage():
+    """Tokens sent and received per kind of model call, and the per-domain ceiling."""
+    return ledger.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, token and cache counters."""
+    body, content_type = render_metrics()
+    # Set the header directly; media_type would append a second charset
+    return Response(content=body, headers={"Content-Type": content_type})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    stats = get_cache_stats()
+    page_cache = get_fetcher().cache
+    if page_cache:
+        stats["pages"] = page_cache.stats()
+    return stats
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Compare the two-call and three-call company analysis pipelines.
+
+Needs OPENAI_API_KEY (or OPENAI_BASE_URL pointing at a compatible server).
+Run from the backend directory:
+
+    python benchmarks/bench_analysis_pipeline.py acme.com example.org
+
+Each domain is analyzed once per mode, bypassing the cache. Prints the
+calls, latency and tokens of every run plus per-mode means.
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_prompts import PIPELINE_MODES, close_async_client, run_company_analysis
+
+
+async def main(domains):
+    runs = []
+    try:
+        for domain in domains:
+            for mode in PIPELINE_MODES:
+                result = await run_company_analysis(domain, mode)
+                runs.append({
+                    "domain": domain,
+                    "success": result.get("success", False),
+                    "fallbacks": result.get("fallbacks", []),
+                    **result.get("pipeline", {"mode": mode})
+                })
+    finally:
+        await close_async_client()
+
+    summary = {}
+    for mode in PIPELINE_MODES:
+        mode_runs = [run for run in runs if run["mode"] == mode and run["success"]]
+        if mode_runs:
+            summary[mode] = {
+                key: round(statistics.mean(run[key] for run in mode_runs), 1)
+                for key in ("calls", "latency_ms", "input_tokens", "output_tokens")
+            }
+    print(json.dumps({"runs": runs, "mean": summary}, indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: bench_analysis_pipeline.py DOMAIN [DOMAIN ...]")
+    asyncio.run(main(sys.argv[1:]))
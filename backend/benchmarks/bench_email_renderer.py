@@ -0,0 +1,121 @@
+"""
+Benchmark the draft body renderer against the previous replace-loop version.
+
+Run from the backend directory:
+
+    python benchmarks/bench_email_renderer.py
+
+First checks that the shipped template (email-builder/data/templates.ts)
+renders to the same visible text and links as with the old code, then
+prints microseconds per KB of body for growing body sizes. The renderer's
+cost per KB should stay flat; the old version's grows with the body.
+"""
+import html
+import json
+import os
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from email_renderer import render_body_html
+
+SIZES_KB = [1, 4, 16, 64, 256]
+PARAGRAPH = (
+    "Hi **Jane**, I noticed **Acme** is growing fast in **retail**.\n"
+    "• **Faster** onboarding for new stores\n"
+    "• Lower costs across **every** region\n"
+    "\n"
+)
+
+
+def legacy_render(body: str) -> str:
+    """The formatting code create_draft used before email_renderer."""
+    formatted_body = body.replace('**', '<strong>', 1)
+    while '**' in formatted_body:
+        formatted_body = formatted_body.replace('**', '</strong>', 1)
+        if '**' in formatted_body:
+            formatted_body = formatted_body.replace('**', '<strong>', 1)
+
+    formatted_body = formatted_body.replace('\n• ', '\n<li>')
+    formatted_body = formatted_body.replace('\n</li>', '</li>\n')
+
+    if '<li>' in formatted_body:
+        lines = formatted_body.split('\n')
+        in_list = False
+        for i in range(len(lines)):
+            if lines[i].strip().startswith('<li>') and not in_list:
+                lines[i] = '<ul>' + lines[i]
+                in_list = True
+            elif in_list and (i == len(lines) - 1 or not lines[i+1].strip().startswith('<li>')):
+                lines[i] = lines[i] + '</ul>'
+                in_list = False
+        formatted_body = '\n'.join(lines)
+
+    return formatted_body.replace('\n', '<br>')
+
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(BACKEND_DIR), 'email-builder', 'data', 'templates.ts')
+SAMPLE_VALUES = {
+    "Recipient": "Jane",
+    "Recipient's Company": "Acme",
+    "industry": "retail",
+    "design_focus": "A faster checkout flow",
+    "dev_focus": "Real-time inventory sync",
+    "ai_focus": "Demand forecasting for every store",
+}
+
+
+def shipped_template_bodies():
+    """The bodies of the templates in templates.ts, with sample placeholder values filled in."""
+    with open(TEMPLATES_PATH, encoding='utf-8') as f:
+        source = f.read()
+    for body in re.findall(r'body: `(.*?)`', source, re.DOTALL):
+        yield re.sub(r'\[([^\]]+)\]', lambda match: SAMPLE_VALUES.get(match.group(1), match.group(0)), body)
+
+
+def visible(rendered: str):
+    """What a mail client shows of rendered HTML: its text and its link targets."""
+    links = re.findall(r'<a href="([^"]*)">', rendered)
+    text = html.unescape(re.sub(r'<[^>]+>', ' ', rendered))
+    return ' '.join(text.split()), links
+
+
+def check_shipped_template() -> None:
+    """Exit with an error if the renderer shows a shipped template differently from the old code."""
+    for body in shipped_template_bodies():
+        new, old = visible(render_body_html(body)), visible(legacy_render(body))
+        if new != old:
+            sys.exit(f"Renderer output differs from the old rendering:\n  new: {new}\n  old: {old}")
+
+
+def time_per_kb(render, body: str, min_seconds: float = 0.2) -> float:
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        render(body)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    return elapsed / runs / (len(body.encode('utf-8')) / 1024) * 1e6
+
+
+def main():
+    check_shipped_template()
+    results = []
+    for size_kb in SIZES_KB:
+        body = PARAGRAPH * max(1, size_kb * 1024 // len(PARAGRAPH.encode('utf-8')))
+        results.append({
+            "size_kb": size_kb,
+            "bold_markers": body.count('**'),
+            "renderer_us_per_kb": round(time_per_kb(render_body_html, body), 2),
+            "legacy_us_per_kb": round(time_per_kb(legacy_render, body), 2)
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+End-to-end throughput benchmark of the API against local stand-ins.
+
+Starts a fake OpenAI server, a fake Gmail API and a static server for a
+generated corpus of company sites (see fake_services.py), runs the API in a
+child process pointed at them, then drives each endpoint at each concurrency
+level. Nothing leaves the machine and no keys are needed. Run from the
+backend directory:
+
+    python benchmarks/bench_pipeline.py --concurrency 1,8,32 --requests 100 \\
+        --output results.json --compare baseline.json
+
+Scenarios: scrape (/scrape-website), generate (/generate-ai-content),
+refine (/refine-email), draft (/create-draft) and campaign (/jobs, one
+recipient per job, from page fetches to the Gmail draft). Every request uses
+a new domain, so caches don't hide the work being measured.
+
+For each scenario and level it reports throughput, p50/p95/p99 latency, the
+API process's resident and peak memory, and the requests the stand-ins saw
+(including injected 429s). Results are written as JSON; with --compare the
+changes from an earlier results file are printed as well. Backend settings
+(e.g. OPENAI_MAX_RETRIES, CAMPAIGN_WORKERS) are read from the environment
+as usual, so the effect of a setting can be measured by exporting it.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_services import FakeGmail, FakeOpenAI, StaticSites, make_corpus
+
+SCENARIOS = ("scrape", "generate", "refine", "draft", "campaign")
+
+# Applied unless already set: no politeness delays towards the local corpus,
+# and plenty of connections so the client isn't the bottleneck
+BENCH_DEFAULTS = {
+    "SCRAPER_GLOBAL_RPS": "10000",
+    "SCRAPER_PER_HOST_RPS": "10000",
+    "SCRAPER_PER_HOST_BURST": "100",
+    "SCRAPER_HOST_RPS_OVERRIDES": "",
+    "OPENAI_MAX_CONNECTIONS": "100",
+}
+
+REFINE_BODY = (
+    "hi there,\n\ni wanted to reach out about [specific achievement or aspect of their business]. "
+    "we help teams like yours ship faster , and i think theres a fit here.\n\nBest, Sam"
+)
+TEMPLATE_BODY = (
+    "Hi [Recipient],\n\nI saw that [Recipient's Company] is focused on "
+    "[specific achievement or aspect of their business]. We could help with [design_focus].\n\n"
+    "Best,\n[Your Name]\n[Your Company]"
+)
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * share // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process, from /proc (Linux only)."""
+    usage = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"
+                    usage[key] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def write_gmail_token(path: str) -> None:
+    """A never-expiring token, so the API skips the OAuth flow."""
+    from google.oauth2.credentials import Credentials
+    with open(path, 'wb') as f:
+        pickle.dump(Credentials(token="bench-token"), f)
+
+
+def ok(response: httpx.Response) -> bool:
+    return response.status_code == 200 and response.json().get("success", True) is not False
+
+
+class Scenarios:
+    """One method per scenario, each making a single request for a new domain."""
+
+    def __init__(self, client: httpx.AsyncClient, corpus: List[str], run_id: str):
+        self.client = client
+        self.corpus = corpus
+        self.run_id = run_id
+        self.counter = 0
+
+    def domain(self) -> str:
+        self.counter += 1
+        return f"company{self.counter}-{self.run_id}.test"
+
+    async def scrape(self) -> bool:
+        return ok(await self.client.post("/scrape-website", json={"domain": self.domain()}))
+
+    async def generate(self) -> bool:
+        return ok(await self.client.post("/generate-ai-content", json={
+            "placeholder": "a recent product launch or milestone",
+            "recipient_email": f"alex@{self.domain()}",
+            "template_name": "Partnership"
+        }))
+
+    async def refine(self) -> bool:
+        domain = self.domain()
+        return ok(await self.client.post("/refine-email", json={
+            "subject": "quick idea", "body": REFINE_BODY, "recipient_email": f"alex@{domain}",
+            "industry": "software", "company_name": domain.split('.')[0].capitalize()
+        }))
+
+    async def draft(self) -> bool:
+        return ok(await self.client.post("/create-draft", data={
+            "recipient_email": f"alex@{self.domain()}",
+            "subject": "A quick idea for your team",
+            "body": "Hi Alex,\n\nI'd love to show you what we've been building.\n\nBest,\nSam"
+        }))
+
+    async def campaign(self) -> bool:
+        domain = self.corpus.pop()
+        response = await self.client.post("/jobs", json={
+            "recipient_emails": [f"alex@{domain}"], "subject": "An idea for [Recipient's Company]",
+            "body": TEMPLATE_BODY, "user_name": "Sam", "user_company": "Bench Co"
+        })
+        if response.status_code != 200:
+            return False
+        job_id = response.json()["job_id"]
+        while True:
+            await asyncio.sleep(0.02)
+            job = (await self.client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                return job["status"] == "completed" and all(
+                    state["status"] != "error" for state in job["domains"].values()
+                )
+
+
+async def run_level(make_request: Callable[[], Awaitable[bool]], concurrency: int,
+                    requests: int) -> Dict[str, Any]:
+    """Make requests calls with at most concurrency in flight; returns throughput and latency."""
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "failed": 0, "errors": 0}
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            started = time.perf_counter()
+            try:
+                outcomes["ok" if await make_request() else "failed"] += 1
+            except Exception as e:
+                print(f"Request failed: {type(e).__name__}: {e}", file=sys.stderr)
+                outcomes["errors"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        **outcomes,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(outcomes["ok"] / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+        }
+    }
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API process exited with code {process.returncode}")
+        try:
+            if (await client.get("/cache/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"API did not start within {timeout:.0f}s")
+
+
+async def benchmark(args, api_url: str, process: subprocess.Popen, corpus: List[str],
+                    services: Dict[str, Any]) -> List[Dict[str, Any]]:
+    results = []
+    timeout = httpx.Timeout(300, connect=10)
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10)
+    async with httpx.AsyncClient(base_url=api_url, timeout=timeout, limits=limits) as client:
+        await wait_until_ready(client, process)
+        scenarios = Scenarios(client, corpus, uuid.uuid4().hex[:6])
+        for name in args.scenarios:
+            make_request = getattr(scenarios, name)
+            # One untimed request first, so one-off setup (service discovery, first connections) isn't counted
+            await make_request()
+            for concurrency in args.concurrency:
+                for service in services.values():
+                    service.reset_stats()
+                level = await run_level(make_request, concurrency, args.requests)
+                result = {
+                    "scenario": name,
+                    **level,
+                    **memory_mb(process.pid),
+                    "upstream": {key: service.reset_stats() for key, service in services.items()}
+                }
+                results.append(result)
+                latency = result["latency_ms"]
+                print(
+                    f"{name:>9} c={concurrency:<4} {result['throughput_rps']:>8.2f} req/s  "
+                    f"p50 {latency['p50']:>8.1f}ms  p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms  "
+                    f"failed {result['failed'] + result['errors']:<4} rss {result['rss_mb']}MB",
+                    file=sys.stderr
+                )
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> List[Dict[str, Any]]:
+    """Change in throughput and p95 latency from a previous results file, per scenario and level."""
+    with open(baseline_path) as f:
+        baseline = {
+            (result["scenario"], result["concurrency"]): result for result in json.load(f)["results"]
+        }
+
+    def change(new: float, old: float) -> Optional[float]:
+        return round((new - old) / old * 100, 1) if old else None
+
+    changes = []
+    for result in results:
+        before = baseline.get((result["scenario"], result["concurrency"]))
+        if before:
+            changes.append({
+                "scenario": result["scenario"],
+                "concurrency": result["concurrency"],
+                "throughput_change_pct": change(result["throughput_rps"], before["throughput_rps"]),
+                "p95_change_pct": change(result["latency_ms"]["p95"], before["latency_ms"]["p95"])
+            })
+    return changes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per scenario and level")
+    parser.add_argument('--openai-latency', type=float, default=0.2, help="Mean seconds per model call")
+    parser.add_argument('--openai-429-rate', type=float, default=0.02, help="Share of model calls answered with 429")
+    parser.add_argument('--openai-retry-after', type=float, default=0.1, help="Retry-After sent with each 429")
+    parser.add_argument('--gmail-latency', type=float, default=0.05, help="Seconds per Gmail API request")
+    parser.add_argument('--page-kb', type=int, default=20, help="Approximate size of each corpus page")
+    parser.add_argument('--output', help="Write the results JSON here (default: stdout)")
+    parser.add_argument('--compare', help="Earlier results JSON to compare against")
+    parser.add_argument('--api-log', default=os.devnull, help="File for the API process's output")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.concurrency = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    return args
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+
+    # One site per campaign request, plus the untimed first one
+    corpus = [f"site{i}.test" for i in range(args.requests * len(args.concurrency) + 1)]
+    if "campaign" in args.scenarios:
+        make_corpus(os.path.join(workdir, "sites"), corpus, args.page_kb)
+    else:
+        os.makedirs(os.path.join(workdir, "sites"))
+    token_file = os.path.join(workdir, "token.pickle")
+    write_gmail_token(token_file)
+
+    services = {
+        "openai": FakeOpenAI(args.openai_latency, args.openai_429_rate, args.openai_retry_after).start(),
+        "gmail": FakeGmail(args.gmail_latency).start(),
+        "sites": StaticSites(os.path.join(workdir, "sites")).start(),
+    }
+
+    env = {**BENCH_DEFAULTS, **os.environ}
+    env.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": services["openai"].url + "/v1",
+        "GOOGLE_CLIENT_ID": "bench",
+        "GOOGLE_CLIENT_SECRET": "bench",
+        "GMAIL_TOKEN_FILE": token_file,
+        "GMAIL_API_ENDPOINT": services["gmail"].url,
+        "GMAIL_BATCH_URI": services["gmail"].batch_url,
+        "ANALYSIS_CACHE_PATH": os.path.join(workdir, "analysis_cache.db"),
+        "PAGE_CACHE_DIR": os.path.join(workdir, "page_cache"),
+        "JOB_STORE_PATH": os.path.join(workdir, "campaign_jobs.db"),
+    })
+    port = free_port()
+    with open(args.api_log, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(BENCHMARKS_DIR, "pipeline_app.py"),
+             "--port", str(port), "--sites-url", services["sites"].url],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            results = asyncio.run(benchmark(args, f"http://127.0.0.1:{port}", process, corpus, services))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            for service in services.values():
+                service.stop()
+
+    report = {
+        "run_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "python": sys.version.split()[0],
+        "settings": {
+            "requests": args.requests,
+            "openai_latency": args.openai_latency,
+            "openai_429_rate": args.openai_429_rate,
+            "openai_retry_after": args.openai_retry_after,
+            "gmail_latency": args.gmail_latency,
+            "page_kb": args.page_kb,
+            "env": {key: env[key] for key in sorted(BENCH_DEFAULTS)}
+        },
+        "results": results
+    }
+    if args.compare:
+        report["comparison"] = {"baseline": args.compare, "changes": compare(results, args.compare)}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    if args.compare:
+        for entry in report["comparison"]["changes"]:
+            throughput, p95 = entry["throughput_change_pct"], entry["p95_change_pct"]
+            print(
+                f"{entry['scenario']:>9} c={entry['concurrency']:<4} "
+                f"throughput {'n/a' if throughput is None else f'{throughput:+}%'}  "
+                f"p95 {'n/a' if p95 is None else f'{p95:+}%'}",
+                file=sys.stderr
+            )
+
+
+if __name__ == "__main__":
+    main()
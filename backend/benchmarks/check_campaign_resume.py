@@ -0,0 +1,96 @@
+"""
+Check that stopping and resuming campaign jobs never creates a draft twice.
+
+Runs campaign jobs against stubbed scraping, analysis and Gmail calls, stops
+the worker pool while drafts are being created (once letting in-flight
+stages finish, once cancelling them straight away), then resumes the jobs
+from the store as a restarted process would. Run from the backend directory:
+
+    python benchmarks/check_campaign_resume.py
+
+Exits with an error if any recipient was drafted more or less than once.
+"""
+import asyncio
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['JOB_STORE_PATH'] = os.path.join(tempfile.mkdtemp(prefix="check_campaign_resume_"), "jobs.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import campaign_jobs
+import gmail_integration
+
+DOMAINS = [f"site{i}.test" for i in range(6)]
+DRAFT_SECONDS = 0.3
+
+drafts = collections.Counter()
+drafts_lock = threading.Lock()
+
+
+async def fake_company_info(domain):
+    return {"company_name": domain.split('.')[0].capitalize(), "description": "A test company."}
+
+
+async def fake_analysis(domain):
+    return {"success": False, "error": "analysis stubbed out"}
+
+
+def fake_create_draft(recipient_email, subject, body, attachment_path=None):
+    time.sleep(DRAFT_SECONDS)
+    with drafts_lock:
+        drafts[recipient_email] += 1
+    return f"draft-{recipient_email}"
+
+
+campaign_jobs.get_company_info = fake_company_info
+campaign_jobs.analyze_company = fake_analysis
+gmail_integration.create_draft = fake_create_draft
+
+
+async def wait_until(condition, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def run(grace: float) -> None:
+    """Stop the workers mid-draft with the given grace period, resume, and count drafts."""
+    drafts.clear()
+    campaign_jobs.start_workers(count=2)
+    job = campaign_jobs.start_job(
+        [f"alex@{domain}" for domain in DOMAINS], "Hello [Recipient's Company]",
+        "Hi [Recipient],\n\nA note for [Recipient's Company].", "Sam", "Bench Co"
+    )
+    # Stop while the first drafts are still being created
+    await asyncio.sleep(DRAFT_SECONDS / 2)
+    await campaign_jobs.stop_workers(grace=grace)
+    # A restarted process only begins once the old one's threads have finished
+    await asyncio.sleep(DRAFT_SECONDS * 2)
+
+    campaign_jobs.jobs.clear()
+    campaign_jobs.start_workers(count=2)
+    campaign_jobs.resume_jobs()
+    resumed = campaign_jobs.get_job(job.id)
+    await wait_until(lambda: resumed.finished)
+    await campaign_jobs.stop_workers()
+
+    wrong = {recipient: count for recipient, count in drafts.items() if count != 1}
+    missing = [f"alex@{domain}" for domain in DOMAINS if f"alex@{domain}" not in drafts]
+    if wrong or missing:
+        sys.exit(f"grace={grace}: drafted more than once {wrong}, never drafted {missing}")
+    print(f"grace={grace}: {len(drafts)} recipients drafted once each")
+
+
+async def main():
+    await run(grace=campaign_jobs.SHUTDOWN_GRACE)
+    await run(grace=0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,312 @@
+"""
+Local stand-ins for the services the backend talks to, used by bench_pipeline.py.
+
+- FakeOpenAI: an OpenAI-compatible /v1/chat/completions and /v1/responses
+  with configurable latency and injected 429s
+- FakeGmail: the Gmail drafts.create method and its batch endpoint
+- StaticSites: a static HTTP server for a generated corpus of company sites,
+  serving each site under /<domain>/
+
+Each runs a ThreadingHTTPServer on a free local port in a daemon thread, so
+slow responses don't hold up other requests.
+"""
+import email
+import email.policy
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def send(self, status: int, body: bytes, content_type: str = 'application/json',
+             headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send(status, json.dumps(payload).encode(), headers=headers)
+
+
+class _Service:
+    """A ThreadingHTTPServer on 127.0.0.1 running in a daemon thread."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def reset_stats(self) -> Dict[str, int]:
+        """Return the counters since the last reset and start again from zero."""
+        with self._stats_lock:
+            stats, self.stats = self.stats, {}
+        return stats
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(re.findall(r'\w{1,4}|[^\w\s]', text)))
+
+
+# Written in the register of the real model so refinement output passes the app's checks
+REFINED_BODY = (
+    "Hi there,\n\nI came across your team's recent work and wanted to reach out. "
+    "We help companies like yours ship better products faster, and I think there is a real opportunity here.\n\n"
+    "Would you be open to a short call next week?\n\nBest regards"
+)
+
+# Values for the fields the app asks for as JSON
+JSON_FIELDS = {
+    "company_name": "Bench Company",
+    "industry": "software",
+    "business_focus": "helping teams ship reliable software faster",
+    "design_focus": "a simpler onboarding flow for new customers",
+    "dev_focus": "moving batch reports to an event-driven pipeline",
+    "ai_focus": "an assistant that drafts support replies",
+    "development_focus": "moving batch reports to an event-driven pipeline",
+    "ai_integration_focus": "an assistant that drafts support replies",
+    "description": "A software company building tools for product teams.",
+}
+
+
+class _OpenAIHandler(_Handler):
+    def do_POST(self):
+        service: FakeOpenAI = self.server.service
+        payload = json.loads(self.read_body() or b'{}')
+        path = self.path.rstrip('/')
+        kind = 'responses' if path.endswith('/responses') else 'chat' if path.endswith('/chat/completions') else None
+        if kind is None:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        service.count(f"{kind}_requests")
+        time.sleep(max(0.0, random.uniform(0.5, 1.5) * service.latency))
+        if random.random() < service.rate_limit_rate:
+            service.count(f"{kind}_rate_limited")
+            self.send_json(429, {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit_error"}}, {
+                'Retry-After': str(service.retry_after),
+                'retry-after-ms': str(int(service.retry_after * 1000)),
+            })
+            return
+
+        if kind == 'chat':
+            self.send_json(200, service.chat_completion(payload))
+        else:
+            self.send_json(200, service.response(payload))
+
+
+class FakeOpenAI(_Service):
+    """
+    OpenAI-compatible server answering chat completions and Responses API calls.
+
+    Every request sleeps for latency seconds (with +/-50% jitter), then a
+    rate_limit_rate share of them get a 429 with Retry-After. Replies are
+    shaped after what the app asks for: JSON for json_object and json_schema
+    formats, "Subject:/Body:" text for refinement, a sentence otherwise.
+    """
+
+    def __init__(self, latency: float = 0.2, rate_limit_rate: float = 0.0, retry_after: float = 0.1):
+        super().__init__(_OpenAIHandler)
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+    def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        messages = payload.get("messages", [])
+        prompt = '\n'.join(message.get("content") or "" for message in messages)
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(JSON_FIELDS)
+        elif "Current Subject:" in prompt:
+            content = f"Subject: A quick idea for your team\nBody: {REFINED_BODY}"
+        else:
+            content = "your recent launch and the way it simplified onboarding"
+        sent, received = _estimate_tokens(prompt), _estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": sent, "completion_tokens": received, "total_tokens": sent + received}
+        }
+
+    def response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        text_format = (payload.get("text") or {}).get("format") or {}
+        if text_format.get("type") == "json_schema":
+            properties = (text_format.get("schema") or {}).get("properties", {})
+            text = json.dumps({key: JSON_FIELDS.get(key, f"Bench {key.replace('_', ' ')}") for key in properties})
+        elif payload.get("tools"):
+            text = "Bench Company is a software company building tools for product teams. " * 20
+        else:
+            text = "software"
+        prompt = payload.get("input") if isinstance(payload.get("input"), str) else json.dumps(payload.get("input"))
+        sent, received = _estimate_tokens(prompt or ""), _estimate_tokens(text)
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}]
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": sent,
+                "output_tokens": received,
+                "total_tokens": sent + received,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0}
+            }
+        }
+
+
+def _draft(request_id: str) -> Dict[str, Any]:
+    return {"id": f"r-{request_id}", "message": {"id": uuid.uuid4().hex[:16], "labelIds": ["DRAFT"]}}
+
+
+class _GmailHandler(_Handler):
+    def do_POST(self):
+        service: FakeGmail = self.server.service
+        body = self.read_body()
+        time.sleep(service.latency)
+        if self.path.rstrip('/') == service.batch_path:
+            self.batch(service, body)
+        elif self.path.split('?')[0].endswith('/drafts'):
+            service.count("drafts")
+            self.send_json(200, _draft(uuid.uuid4().hex[:8]))
+        else:
+            self.send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+
+    def batch(self, service: 'FakeGmail', body: bytes) -> None:
+        """Answer each part of a multipart/mixed batch with a created draft."""
+        service.count("batches")
+        message = email.message_from_bytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body, policy=email.policy.compat32
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.get_payload():
+            service.count("drafts")
+            content_id = part['Content-ID'].strip('<>')
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(_draft(content_id))}\r\n"
+            )
+        self.send(200, (''.join(parts) + f"--{boundary}--\r\n").encode(), f"multipart/mixed; boundary={boundary}")
+
+
+class FakeGmail(_Service):
+    """
+    Gmail API stand-in for drafts.create, alone and in batch requests.
+
+    Point GMAIL_API_ENDPOINT at url and GMAIL_BATCH_URI at batch_url. Every
+    request (a batch counts as one) takes latency seconds.
+    """
+
+    batch_path = '/batch/gmail/v1'
+
+    def __init__(self, latency: float = 0.05):
+        super().__init__(_GmailHandler)
+        self.latency = latency
+        self.batch_url = self.url + self.batch_path
+
+
+SITE_PAGES = {
+    "index.html": """<html><head><title>{name} | Software for product teams</title>
+<meta name="description" content="{name} builds tools that help product teams ship faster."></head>
+<body><h1>{name}</h1><p>{name} builds tools that help product teams plan, build and ship software.</p>
+<h2>Products</h2><ul><li>{name} Planner</li><li>{name} Insights</li><li>{name} Connect</li></ul>
+{filler}</body></html>""",
+    "about/index.html": """<html><head><title>About {name}</title></head>
+<body><h1>About us</h1><p>Founded in 2015, {name} serves over 2,000 customers in 40 countries.</p>
+<p>Our mission is to make software delivery predictable.</p>{filler}</body></html>""",
+    "company/index.html": """<html><head><title>{name} - Company</title></head>
+<body><h1>Company</h1><p>{name} was named a leader in product analytics in 2023.</p>{filler}</body></html>""",
+}
+
+
+def make_corpus(directory: str, domains: List[str], page_kb: int = 20) -> None:
+    """Write a small site (home, about and company pages) for each domain into directory."""
+    paragraph = "<p>" + "We partner with engineering and design teams to improve how they work. " * 10 + "</p>\n"
+    filler = paragraph * max(1, page_kb * 1024 // len(paragraph))
+    for domain in domains:
+        name = domain.split('.')[0].capitalize()
+        for page, template in SITE_PAGES.items():
+            path = os.path.join(directory, domain, page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(template.format(name=name, filler=filler))
+
+
+class _SiteHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def translate_path(self, path):
+        # Serve directory indexes without the trailing-slash redirect, so
+        # https://acme.test/about maps to /acme.test/about/index.html
+        translated = super().translate_path(path)
+        if os.path.isdir(translated):
+            return os.path.join(translated, 'index.html')
+        return translated
+
+    def send_head(self):
+        self.server.service.count("pages" if os.path.isfile(self.translate_path(self.path)) else "not_found")
+        return super().send_head()
+
+
+class StaticSites(_Service):
+    """Serves a corpus written by make_corpus; each site lives under /<domain>/."""
+
+    def __init__(self, directory: str):
+        def handler(*args, **kwargs):
+            return _SiteHandler(*args, directory=directory, **kwargs)
+        super().__init__(handler)
+        self.directory = directory
@@ -0,0 +1,59 @@
+"""
+Run the API for bench_pipeline.py, with every page fetch served by a local corpus.
+
+Started by bench_pipeline.py in its own process so its memory can be
+measured; the OpenAI, Gmail and storage settings come from the environment
+it sets. Can also be run by hand against a StaticSites server:
+
+    python benchmarks/pipeline_app.py --port 8100 --sites-url http://127.0.0.1:8200
+"""
+import argparse
+import os
+import sys
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import page_fetcher
+from page_cache import PAGE_CACHE_ENABLED, PageCache
+
+
+class CorpusTransport(httpx.AsyncBaseTransport):
+    """Sends https://<domain>/<path> to <sites_url>/<domain>/<path> instead."""
+
+    def __init__(self, sites_url: str):
+        self.sites_url = httpx.URL(sites_url)
+        self.transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=page_fetcher.MAX_CONNECTIONS,
+            max_keepalive_connections=page_fetcher.MAX_KEEPALIVE_CONNECTIONS
+        ))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = self.sites_url.copy_with(path=f"/{request.url.host}{request.url.path}", query=request.url.query or None)
+        return await self.transport.handle_async_request(
+            httpx.Request(request.method, url, headers=request.headers, extensions=request.extensions)
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--sites-url', required=True, help="Root URL of the StaticSites server")
+    args = parser.parse_args()
+
+    page_fetcher._fetcher = page_fetcher.PageFetcher(
+        cache=PageCache() if PAGE_CACHE_ENABLED else None,
+        transport=CorpusTransport(args.sites_url)
+    )
+
+    from api import app
+    uvicorn.run(app, host='127.0.0.1', port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import gmail_integration
+from ai_prompts import analyze_company
+from email_refiner import refine_email_content
+from job_store import JOB_RETENTION, JobStore
+from metrics import CAMPAIGN_STAGE_SECONDS
+from web_scraper import get_company_info
+
+# Domains worked on at once across all jobs
+CAMPAIGN_WORKERS = int(os.getenv('CAMPAIGN_WORKERS', '8'))
+# Seconds a shutdown waits for in-flight stages to finish and checkpoint
+SHUTDOWN_GRACE = float(os.getenv('CAMPAIGN_SHUTDOWN_GRACE', '30'))
+# Seconds between keep-alive comments on an idle event stream
+EVENT_STREAM_HEARTBEAT = float(os.getenv('CAMPAIGN_EVENT_HEARTBEAT', '15'))
+
+# Per-domain stages, in order
+SCRAPED = "scraped"
+ANALYZED = "analyzed"
+RENDERED = "rendered"
+REFINED = "refined"
+DRAFTED = "drafted"
+
+# Defaults the batch processor uses when analysis doesn't provide a value
+DEFAULT_INDUSTRY = 'technology'
+DEFAULT_BUSINESS_FOCUS = 'business growth and digital transformation'
+DEFAULT_DESIGN_FOCUS = "UI/UX optimization for improved user engagement"
+DEFAULT_DEV_FOCUS = "Scalable, AI-powered architecture"
+DEFAULT_AI_FOCUS = "Custom AI solutions for automation and efficiency"
+
+_PLACEHOLDER = re.compile(r'\[[^\]]+\]')
+
+
+def extract_name_from_email(email: str) -> str:
+    """Turn 'john.doe@acme.com' into 'John Doe'."""
+    if '@' not in email:
+        return ''
+    local_part = re.sub(r'[._]', ' ', email.split('@')[0])
+    return ' '.join(word[:1].upper() + word[1:] for word in local_part.split(' '))
+
+
+def join_names(names: List[str]) -> str:
+    if len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    if len(names) > 2:
+        return f"{', '.join(names[:-1])}, and {names[-1]}"
+    return names[0] if names else ''
+
+
+def build_company_profile(domain: str, analysis: Dict[str, Any], scraped: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Combine the AI analysis, the scraped site info and the usual defaults.
+
+    Analysis values win; scraped values fill gaps when the analysis failed
+    or left a field empty.
+    """
+    search_data = analysis.get("searchData") or {}
+    first_label = domain.split('.')[0]
+    industry = search_data.get("industry") or scraped.get("industry") or DEFAULT_INDUSTRY
+    return {
+        "name": search_data.get("company_name") or scraped.get("company_name") or first_label[:1].upper() + first_label[1:],
+        "industry": industry,
+        "business_focus": search_data.get("business_focus") or scraped.get("business_focus") or DEFAULT_BUSINESS_FOCUS,
+        "design_focus": search_data.get("design_focus") or DEFAULT_DESIGN_FOCUS,
+        "dev_focus": search_data.get("development_focus") or DEFAULT_DEV_FOCUS,
+        "ai_focus": search_data.get("ai_integration_focus") or DEFAULT_AI_FOCUS,
+        "description": (
+            search_data.get("description") or scraped.get("description")
+            or f"A company providing solutions in the {industry} industry"
+        ),
+    }
+
+
+def fill_template(subject: str, body: str, company: Dict[str, str], recipients: List[str],
+                  user_name: str, user_company: str) -> Tuple[str, str]:
+    """
+    Fill a template's [placeholders] the same way the batch email processor does.
+
+    Values are applied in three rounds (company fields, people, fallbacks)
+    and any placeholder still left afterwards is removed.
+    """
+    product_vision_line = company["description"].split('.')[0]
+    rounds = [
+        {
+            "Recipient's Company": company["name"],
+            "Industry": company["industry"],
+            "industry": company["industry"],
+            "specific achievement or aspect of their business": company["business_focus"],
+            "Insert a line about their product, vision": product_vision_line
+        },
+        {
+            "Recipient": join_names([extract_name_from_email(email) for email in recipients]),
+            "Recipient's Company": company["name"],
+            "Your Name": user_name,
+            "Your Company": user_company,
+            "design_focus": company["design_focus"],
+            "dev_focus": company["dev_focus"],
+            "ai_focus": company["ai_focus"]
+        },
+        {
+            "Recipient": "there",
+            "Recipient's Company": company["name"],
+            "Your Name": user_name or "Me",
+            "Your Company": user_company or "Our Company",
+            "industry": company["industry"],
+            "Industry": company["industry"],
+            "specific achievement or aspect of their business": company["business_focus"],
+            "Insert a line about their product, vision": product_vision_line,
+            "design_focus": company["design_focus"],
+            "dev_focus": company["dev_focus"],
+            "ai_focus": company["ai_focus"]
+        }
+    ]
+    for values in rounds:
+        for placeholder, value in values.items():
+            if value:
+                subject = subject.replace(f"[{placeholder}]", value)
+                body = body.replace(f"[{placeholder}]", value)
+
+    # Never send a draft with placeholders in it
+    return _PLACEHOLDER.sub('', subject), _PLACEHOLDER.sub('', body)
+
+
+def group_recipients(recipient_emails: List[str]) -> Dict[str, List[str]]:
+    """Group recipient emails by domain, dropping invalid and duplicate addresses."""
+    groups: Dict[str, List[str]] = {}
+    for email in recipient_emails:
+        email = email.strip()
+        if '@' not in email:
+            continue
+        domain = email.split('@')[1].lower()
+        if domain and email not in groups.setdefault(domain, []):
+            groups[domain].append(email)
+    return {domain: emails for domain, emails in groups.items() if emails}
+
+
+class CampaignJob:
+    """
+    One batch campaign running on the server.
+
+    Each domain goes through scraped -> analyzed -> rendered, then refined
+    and drafted when requested, on the shared worker pool. The output of
+    every stage is checkpointed in the job store, so a job picked up again
+    after a restart only runs the stages that haven't finished. Every stage
+    transition is appended to an event log that any number of listeners can
+    replay and follow, so the job keeps going whether or not anyone is
+    watching.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]], subject: str, body: str,
+                 user_name: str, user_company: str, create_drafts: bool = True,
+                 refine: bool = False, job_id: Optional[str] = None,
+                 created_at: Optional[float] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.groups = groups
+        self.subject = subject
+        self.body = body
+        self.user_name = user_name
+        self.user_company = user_company
+        self.create_drafts = create_drafts
+        self.refine = refine
+        self.stages = [SCRAPED, ANALYZED, RENDERED]
+        if refine:
+            self.stages.append(REFINED)
+        if create_drafts:
+            self.stages.append(DRAFTED)
+        self.status = "pending"
+        self.created_at = created_at or time.time()
+        self.finished_at: Optional[float] = None
+        self.domains: Dict[str, Dict[str, Any]] = {
+            domain: {"recipients": recipients, "stage": None, "status": "pending"}
+            for domain, recipients in groups.items()
+        }
+        # Stage name -> output for each domain; what gets checkpointed
+        self.outputs: Dict[str, Dict[str, Any]] = {domain: {} for domain in groups}
+        self.remaining = set(groups)
+        self.events: List[Dict[str, Any]] = []
+        self._changed = asyncio.Event()
+
+    @classmethod
+    def restore(cls, record: Dict[str, Any]) -> "CampaignJob":
+        """Rebuild a job from the store, keeping finished domains and past events."""
+        params = record["params"]
+        job = cls(
+            params["groups"], params["subject"], params["body"], params["user_name"],
+            params["user_company"], create_drafts=params["create_drafts"], refine=params["refine"],
+            job_id=record["id"], created_at=record["created_at"]
+        )
+        for domain, task in record["tasks"].items():
+            job.domains[domain] = task["state"]
+            job.outputs[domain] = task["outputs"]
+            if task["done"]:
+                job.remaining.discard(domain)
+        job.events = record["events"]
+        job.status = "running"
+        return job
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "groups": self.groups,
+            "subject": self.subject,
+            "body": self.body,
+            "user_name": self.user_name,
+            "user_company": self.user_company,
+            "create_drafts": self.create_drafts,
+            "refine": self.refine
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def emit(self, event_type: str, **data: Any) -> None:
+        event = {"id": len(self.events), "type": event_type, "at": round(time.time(), 3), **data}
+        self.events.append(event)
+        store.add_event(self.id, event)
+        # Wake everyone waiting on the current event, then start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_event(self, next_id: int, timeout: float) -> bool:
+        """Wait until event next_id exists or the job finishes; False on timeout."""
+        changed = self._changed
+        if next_id < len(self.events) or self.finished:
+            return True
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def start(self) -> None:
+        self.status = "running"
+        store.create_job(self.id, self.params(), self.created_at, self.domains)
+        self.emit("job_started", domains=len(self.groups), recipients=sum(len(r) for r in self.groups.values()))
+        self._enqueue()
+
+    def resume(self) -> None:
+        self.emit("job_resumed", pending=len(self.remaining))
+        self._enqueue()
+
+    def _enqueue(self) -> None:
+        if not self.remaining:
+            self._finish()
+            return
+        for domain in self.groups:
+            if domain in self.remaining:
+                _task_queue().put_nowait((self, domain))
+
+    def _finish(self) -> None:
+        self.status = "completed"
+        failed = sum(1 for state in self.domains.values() if state["status"] == "error")
+        self.finished_at = time.time()
+        store.finish_job(self.id, self.status, self.finished_at)
+        self.emit("job_finished", succeeded=len(self.domains) - failed, failed=failed)
+
+    def _stage(self, domain: str, stage: str, started: float, status: str = "completed", **details: Any) -> None:
+        state = self.domains[domain]
+        state["stage"] = stage
+        state["status"] = status
+        state.update(details)
+        CAMPAIGN_STAGE_SECONDS.labels(stage, status).observe(time.monotonic() - started)
+        done = status == "error" or stage == self.stages[-1]
+        store.checkpoint(self.id, domain, state, self.outputs[domain], done)
+        self.emit(
+            "stage", domain=domain, stage=stage, status=status,
+            elapsed_ms=round((time.monotonic() - started) * 1000), **details
+        )
+
+    async def process_domain(self, domain: str) -> None:
+        """Run every stage of a domain that has no checkpointed output yet."""
+        recipients = self.groups[domain]
+        outputs = self.outputs[domain]
+        stage = self.stages[0]
+        started = time.monotonic()
+        try:
+            for stage in self.stages:
+                if stage in outputs:
+                    continue
+                if _stopping:
+                    # Shutting down: the domain stays pending and resumes at this stage
+                    return
+                started = time.monotonic()
+                output, status, details = await self._run_stage(stage, domain, recipients, outputs)
+                outputs[stage] = output
+                self._stage(domain, stage, started, status, **details)
+        except Exception as e:
+            print(f"Campaign job {self.id}: {stage} failed for {domain}: {str(e)}")
+            self._stage(domain, stage, started, status="error", error=str(e))
+
+        self.remaining.discard(domain)
+        if not self.remaining:
+            self._finish()
+
+    async def _run_stage(self, stage: str, domain: str, recipients: List[str],
+                         outputs: Dict[str, Any]) -> Tuple[Any, str, Dict[str, Any]]:
+        """Run one stage; returns (output to checkpoint, status, event details)."""
+        loop = asyncio.get_running_loop()
+
+        if stage == SCRAPED:
+            return await get_company_info(domain), "completed", {}
+
+        if stage == ANALYZED:
+            analysis = await analyze_company(domain)
+            if analysis.get("success"):
+                return analysis, "completed", {}
+            # Carry on with scraped info and defaults, as the batch processor does
+            return analysis, "fallback", {"fallback_reason": analysis.get("error", "Failed to analyze company")}
+
+        if stage == RENDERED:
+            company = build_company_profile(domain, outputs[ANALYZED], outputs[SCRAPED])
+            subject, body = fill_template(
+                self.subject, self.body, company, recipients, self.user_name, self.user_company
+            )
+            details = {"company_name": company["name"], "subject": subject, "body": body}
+            return {"company": company, "subject": subject, "body": body}, "completed", details
+
+        if stage == REFINED:
+            rendered = outputs[RENDERED]
+            company = rendered["company"]
+            try:
+                refined = await loop.run_in_executor(
+                    None, refine_email_content, rendered["subject"], rendered["body"], recipients[0],
+                    {"industry": company["industry"], "company_name": company["name"]}
+                )
+            except Exception as e:
+                # An unrefined draft is still worth sending
+                email = {"subject": rendered["subject"], "body": rendered["body"]}
+                return email, "fallback", {**email, "fallback_reason": str(e)}
+            email = {"subject": refined["subject"], "body": refined["body"]}
+            if not refined["refined"]:
+                # Passed the refiner's quality check, so the model wasn't called
+                return email, "skipped", email
+            return email, "completed", {**email, "issues": refined["issues"]}
+
+        if stage == DRAFTED:
+            email = outputs.get(REFINED) or outputs[RENDERED]
+            draft_id = await loop.run_in_executor(None, self._create_draft, domain, recipients, email)
+            return {"draft_id": draft_id}, "completed", {"draft_id": draft_id}
+
+        raise ValueError(f"Unknown stage {stage}")
+
+    def _create_draft(self, domain: str, recipients: List[str], email: Dict[str, str]) -> str:
+        """
+        Create the domain's draft and checkpoint it from the executor thread.
+
+        Checkpointing here, rather than once the stage returns to the event
+        loop, means a draft created after its stage was cancelled (e.g. by a
+        shutdown) is still recorded, so resuming the job won't create it again.
+        """
+        # Every recipient at a domain goes on the same draft
+        draft_id = gmail_integration.create_draft(','.join(recipients), email["subject"], email["body"])
+        state = {**self.domains[domain], "stage": DRAFTED, "status": "completed", "draft_id": draft_id}
+        outputs = {**self.outputs[domain], DRAFTED: {"draft_id": draft_id}}
+        store.checkpoint(self.id, domain, state, outputs, done=True)
+        return draft_id
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": self.stages,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "domains": self.domains,
+            "events": len(self.events)
+        }
+
+
+store = JobStore()
+jobs: Dict[str, CampaignJob] = {}
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_stopping = False
+
+
+def _task_queue() -> asyncio.Queue:
+    """The queue of (job, domain) tasks, starting the worker pool if needed."""
+    if not _workers:
+        start_workers()
+    return _queue
+
+
+def start_workers(count: int = CAMPAIGN_WORKERS) -> None:
+    """Start the worker tasks that process campaign domains; call from the event loop."""
+    global _queue, _stopping
+    if _workers:
+        return
+    _stopping = False
+    _queue = asyncio.Queue()
+    for _ in range(max(1, count)):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def _worker() -> None:
+    while True:
+        task = await _queue.get()
+        if task is None:
+            _queue.task_done()
+            return
+        job, domain = task
+        try:
+            await job.process_domain(domain)
+        except Exception as e:
+            print(f"Campaign worker failed on {domain}: {str(e)}")
+        finally:
+            _queue.task_done()
+
+
+async def stop_workers(grace: float = SHUTDOWN_GRACE) -> None:
+    """
+    Stop the worker pool, letting in-flight stages finish first.
+
+    Queued domains are dropped (they are still pending in the store) and
+    each busy worker stops after its current stage has been checkpointed.
+    Workers still busy after grace seconds are cancelled; their stages run
+    again when the job is resumed, except drafts, which are checkpointed by
+    the thread that creates them.
+    """
+    global _stopping
+    if not _workers:
+        return
+    _stopping = True
+    while not _queue.empty():
+        _queue.get_nowait()
+        _queue.task_done()
+    for _ in _workers:
+        _queue.put_nowait(None)
+    _, busy = await asyncio.wait(_workers, timeout=grace)
+    if busy:
+        print(f"Cancelling {len(busy)} campaign workers still busy after {grace:.0f}s")
+    for worker in busy:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def resume_jobs() -> int:
+    """
+    Pick up every job left unfinished by a previous process; returns how many.
+
+    Jobs that finished past the retention period are deleted from the store first.
+    """
+    pruned = store.prune()
+    if pruned:
+        print(f"Removed {pruned} finished campaign jobs older than {JOB_RETENTION:.0f}s")
+    records = store.unfinished_jobs()
+    for record in records:
+        job = CampaignJob.restore(record)
+        jobs[job.id] = job
+        print(f"Resuming campaign job {job.id} with {len(job.remaining)} of {len(job.groups)} domains left")
+        job.resume()
+    return len(records)
+
+
+def _forget_finished_jobs() -> None:
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [job_id for job_id, job in jobs.items() if job.finished and job.finished_at < cutoff]:
+        del jobs[job_id]
+    # Also covers jobs finished by earlier processes, which were never loaded
+    store.prune()
+
+
+def start_job(recipient_emails: List[str], subject: str, body: str, user_name: str,
+              user_company: str, create_drafts: bool = True, refine: bool = False) -> CampaignJob:
+    """Create a campaign job, store it and queue its domains for the workers."""
+    _forget_finished_jobs()
+    job = CampaignJob(
+        group_recipients(recipient_emails), subject, body, user_name, user_company,
+        create_drafts=create_drafts, refine=refine
+    )
+    jobs[job.id] = job
+    job.start()
+    return job
+
+
+def get_job(job_id: str) -> Optional[CampaignJob]:
+    return jobs.get(job_id)
+
+
+async def stream_events(job: CampaignJob, last_event_id: int = -1) -> AsyncIterator[str]:
+    """
+    Yield a job's events as Server-Sent Events, replaying any after last_event_id.
+
+    The stream ends once the job has finished and every event was sent.
+    """
+    next_id = last_event_id + 1
+    while True:
+        while next_id < len(job.events):
+            event = job.events[next_id]
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            next_id += 1
+        if job.finished:
+            return
+        if not await job.wait_for_event(next_id, EVENT_STREAM_HEARTBEAT):
+            yield ": keep-alive\n\n"
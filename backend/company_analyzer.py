@@ -1,11 +1,37 @@
-from typing import Dict, Any
-import openai
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-import os
+from openai_http import completion_text, get_openai_http
+from prompt_budget import DESCRIPTION_TOKEN_BUDGET, trim_to_budget
 import json
 
 load_dotenv()
-openai.api_key = os.getenv('OPENAI_API_KEY')
+
+def run_dependency_graph(nodes: Dict[str, Tuple[Callable[..., Any], List[str]]]) -> Dict[str, Any]:
+    """
+    Run blocking calls that depend on each other's results, each as soon as its inputs are ready.
+
+    nodes maps a name to (function, names of the nodes it depends on); the
+    function is called with those results as keyword arguments. Calls whose
+    inputs are ready run concurrently on a thread pool. Returns every
+    node's result by name.
+    """
+    results: Dict[str, Any] = {}
+    pending = dict(nodes)
+    with ThreadPoolExecutor(max_workers=max(1, len(nodes))) as pool:
+        running = {}
+        while pending or running:
+            for name, (function, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    inputs = {dependency: results[dependency] for dependency in dependencies}
+                    running[pool.submit(function, **inputs)] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Unsatisfiable dependencies for {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
 
 def extract_business_focus(description: str) -> str:
     """
@@ -37,17 +63,17 @@ def extract_business_focus(description: str) -> str:
     """
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
+        response = get_openai_http().chat_completion({
+            "model": "gpt-4",
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.7,
-            max_tokens=100
-        )
+            "temperature": 0.7,
+            "max_tokens": 100
+        }, call="business_focus")
         
-        business_focus = response.choices[0].message.content.strip()
+        business_focus = completion_text(response).strip()
         # Remove any quotes or extra formatting
         business_focus = business_focus.strip('"\'')
         return business_focus
@@ -92,17 +118,17 @@ def generate_focus_areas(business_focus: str, industry: str) -> dict:
     """
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
+        response = get_openai_http().chat_completion({
+            "model": "gpt-4",
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.7,
-            response_format={ "type": "json_object" }
-        )
+            "temperature": 0.7,
+            "response_format": { "type": "json_object" }
+        }, call="focus_areas")
 
-        focus_areas = response.choices[0].message.content
+        focus_areas = completion_text(response)
         return json.loads(focus_areas)
     except Exception as e:
         print(f"Error generating focus areas: {str(e)}")
@@ -128,16 +154,13 @@ def enhance_company_data(scraped_data: Dict[str, Any]) -> Dict[str, Any]:
         if scraped_data.get('achievements'):
             description_parts.append(f"Notable achievements: {', '.join(scraped_data['achievements'])}")
         description = ' '.join(description_parts)
+    description = trim_to_budget(description, DESCRIPTION_TOKEN_BUDGET)
 
-    # Extract business focus first
-    business_focus = extract_business_focus(description)
     industry = scraped_data.get('industry', '')
 
-    # Generate focus areas based on business focus and industry
-    focus_areas = generate_focus_areas(business_focus, industry)
-
-    # Now proceed with the full analysis
-    context = f"""
+    def analyze(business_focus: str) -> Optional[Dict[str, Any]]:
+        """The full analysis, which needs the business focus in its context."""
+        context = f"""
     Company Information:
     Name: {scraped_data.get('company_name', '')}
     Description: {description}
@@ -146,7 +169,7 @@ def enhance_company_data(scraped_data: Dict[str, Any]) -> Dict[str, Any]:
     Achievements: {', '.join(scraped_data.get('achievements', []))}
     """
 
-    system_prompt = """
+        system_prompt = """
     You are an expert business analyst. Analyze the provided company information and:
     1. Identify the primary industry and any sub-industries
     2. Highlight key achievements and market position
@@ -157,35 +180,38 @@ def enhance_company_data(scraped_data: Dict[str, Any]) -> Dict[str, Any]:
     Keep descriptions concise but meaningful.
     """
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze this company:\n{context}"}
-            ],
-            temperature=0.5,
-            response_format={ "type": "json_object" }
-        )
-
-        # Parse AI-enhanced data
-        enhanced_data = response.choices[0].message.content
-        
-        # Merge AI-enhanced data with original scraped data and add the business focus
-        final_data = {
-            **scraped_data,
-            **enhanced_data,
-            "business_focus": business_focus,
-            "design_focus": focus_areas["design_focus"],
-            "dev_focus": focus_areas["dev_focus"],
-            "ai_focus": focus_areas["ai_focus"],
-            "ai_enhanced": True
-        }
-
-        return final_data
-
-    except Exception as e:
-        print(f"Error in AI enhancement: {str(e)}")
+        try:
+            response = get_openai_http().chat_completion({
+                "model": "gpt-4",
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Analyze this company:\n{context}"}
+                ],
+                "temperature": 0.5,
+                "response_format": { "type": "json_object" }
+            }, call="company_enhancement")
+
+            # Parse AI-enhanced data
+            enhanced_data = json.loads(completion_text(response))
+            if not isinstance(enhanced_data, dict):
+                raise ValueError("Analysis response is not a JSON object")
+            return enhanced_data
+        except Exception as e:
+            print(f"Error in AI enhancement: {str(e)}")
+            return None
+
+    # The focus areas prompt only uses the industry, so it runs alongside the
+    # business focus extraction; the full analysis starts once the focus is in
+    results = run_dependency_graph({
+        "business_focus": (lambda: extract_business_focus(description), []),
+        "focus_areas": (lambda: generate_focus_areas("", industry), []),
+        "enhanced_data": (analyze, ["business_focus"]),
+    })
+    business_focus = results["business_focus"]
+    focus_areas = results["focus_areas"]
+    enhanced_data = results["enhanced_data"]
+
+    if enhanced_data is None:
         # If enhancement fails, at least return the business focus
         return {
             **scraped_data,
@@ -194,4 +220,15 @@ def enhance_company_data(scraped_data: Dict[str, Any]) -> Dict[str, Any]:
             "dev_focus": focus_areas["dev_focus"],
             "ai_focus": focus_areas["ai_focus"],
             "ai_enhanced": False
-        } 
\ No newline at end of file
+        }
+
+    # Merge AI-enhanced data with original scraped data and add the business focus
+    return {
+        **scraped_data,
+        **enhanced_data,
+        "business_focus": business_focus,
+        "design_focus": focus_areas["design_focus"],
+        "dev_focus": focus_areas["dev_focus"],
+        "ai_focus": focus_areas["ai_focus"],
+        "ai_enhanced": True
+    }
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+from domains import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+# Requests per second across all hosts
+GLOBAL_RPS = float(os.getenv('SCRAPER_GLOBAL_RPS', '20'))
+# Sustained requests per second and burst size allowed against any one host
+PER_HOST_RPS = float(os.getenv('SCRAPER_PER_HOST_RPS', '1'))
+PER_HOST_BURST = float(os.getenv('SCRAPER_PER_HOST_BURST', '4'))
+# Requests allowed in flight to any one host at a time
+PER_HOST_CONCURRENCY = int(os.getenv('SCRAPER_PER_HOST_CONCURRENCY', '2'))
+# Stricter per-host rates, e.g. "linkedin.com=0.2,facebook.com=0.5"
+HOST_RPS_OVERRIDES = os.getenv('SCRAPER_HOST_RPS_OVERRIDES', 'linkedin.com=0.2')
+# Longest a request may queue for its turn before the page is skipped (0 waits however long it takes)
+MAX_QUEUE_WAIT = float(os.getenv('SCRAPER_MAX_QUEUE_WAIT', '60'))
+# How often hosts with nothing queued and a full bucket are forgotten
+IDLE_HOST_SWEEP_INTERVAL = 60.0
+
+
+class QueueWaitExceeded(Exception):
+    """A request would have waited longer than the scheduler's max_wait for its turn."""
+
+
+def parse_host_overrides(value: str) -> Dict[str, float]:
+    """
+    Parse 'host=rps,host=rps' into a mapping of normalized host to rate.
+
+    Entries whose rate isn't a positive number are logged and skipped, as a
+    token bucket can't refill at a zero or negative rate.
+    """
+    overrides = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        host, rate = item.split('=', 1)
+        try:
+            rps = float(rate)
+        except ValueError:
+            rps = 0.0
+        if not rps > 0:
+            logger.warning(f"Ignoring host rate override {item.strip()!r}: rate must be a positive number")
+            continue
+        overrides[normalize_domain(host)] = rps
+    return overrides
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of blocking.
+
+    reserve() always takes a token, letting the balance go negative, and
+    returns how long the caller must wait before its token is actually
+    available. Waiters therefore queue up in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Take a token and return the wait for it, or None (taking nothing) if that exceeds max_wait."""
+        self._refill()
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def release(self) -> None:
+        """Give back a reserved token that won't be used."""
+        self.tokens += 1
+
+    def is_full(self) -> bool:
+        """True once every reservation has been served and the bucket has refilled."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class _HostState:
+    """Per-host rate limit and concurrency slots, plus how many requests are using them."""
+
+    def __init__(self, bucket: TokenBucket, concurrency: int):
+        self.bucket = bucket
+        self.slots = asyncio.Semaphore(concurrency)
+        self.users = 0
+
+
+class CrawlScheduler:
+    """
+    Decides when each page fetch may start.
+
+    Three limits are enforced together: a global requests-per-second cap, a
+    per-host token bucket (with optional stricter rates for specific hosts)
+    and a per-host concurrency limit. Fetches to different hosts proceed in
+    parallel; fetches to the same host are spaced out however many domains
+    in a batch point at it.
+
+    A request that would queue longer than max_wait for its turn raises
+    QueueWaitExceeded instead, so a slow host (say, LinkedIn at 0.2 rps)
+    can't hold the last domains of a large batch for minutes. Hosts that
+    have nothing queued and have refilled their bucket are forgotten, so
+    the per-host state doesn't grow with every host ever crawled.
+    """
+
+    def __init__(self, global_rps: float = GLOBAL_RPS, per_host_rps: float = PER_HOST_RPS,
+                 per_host_burst: float = PER_HOST_BURST, per_host_concurrency: int = PER_HOST_CONCURRENCY,
+                 host_overrides: Optional[Dict[str, float]] = None, max_wait: float = MAX_QUEUE_WAIT):
+        self.per_host_rps = per_host_rps
+        self.per_host_burst = per_host_burst
+        self.per_host_concurrency = per_host_concurrency
+        self.host_overrides = parse_host_overrides(HOST_RPS_OVERRIDES) if host_overrides is None else host_overrides
+        self.max_wait = max_wait if max_wait > 0 else None
+        self._global_bucket = TokenBucket(global_rps, max(1.0, global_rps))
+        self._hosts: Dict[str, _HostState] = {}
+        self._swept_at = time.monotonic()
+        self.total_wait = 0.0
+        self.skipped = 0
+
+    def _host_key(self, url: str) -> str:
+        return normalize_domain(urlsplit(url).hostname or "")
+
+    def _override_rate(self, host: str) -> Optional[float]:
+        # Overrides apply to the host and all of its subdomains
+        for override_host, rate in self.host_overrides.items():
+            if host == override_host or host.endswith('.' + override_host):
+                return rate
+        return None
+
+    def _host(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            rate = self._override_rate(host)
+            if rate is None:
+                bucket = TokenBucket(self.per_host_rps, self.per_host_burst)
+            else:
+                # No bursts against hosts that have a stricter rate
+                bucket = TokenBucket(rate, 1.0)
+            self._hosts[host] = _HostState(bucket, self.per_host_concurrency)
+        return self._hosts[host]
+
+    def _evict_idle_hosts(self) -> None:
+        # A host with no requests and a full bucket behaves exactly like a new one
+        now = time.monotonic()
+        if now - self._swept_at < IDLE_HOST_SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        for host, state in list(self._hosts.items()):
+            if state.users == 0 and state.bucket.is_full():
+                del self._hosts[host]
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _skip(self, url: str) -> QueueWaitExceeded:
+        self.skipped += 1
+        return QueueWaitExceeded(f"{url} would wait more than {self.max_wait:g}s for its turn")
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Wait until a request to url is allowed, and hold its host slot while it runs.
+
+        Raises QueueWaitExceeded if the wait would be longer than max_wait.
+        """
+        self._evict_idle_hosts()
+        deadline = None if self.max_wait is None else time.monotonic() + self.max_wait
+        state = self._host(self._host_key(url))
+        state.users += 1
+        try:
+            try:
+                await asyncio.wait_for(state.slots.acquire(), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                raise self._skip(url) from None
+            try:
+                remaining = self._remaining(deadline)
+                host_wait = state.bucket.reserve(remaining)
+                if host_wait is None:
+                    raise self._skip(url)
+                global_wait = self._global_bucket.reserve(None if remaining is None else remaining - host_wait)
+                if global_wait is None:
+                    state.bucket.release()
+                    raise self._skip(url)
+                for wait in (host_wait, global_wait):
+                    if wait > 0:
+                        self.total_wait += wait
+                        await asyncio.sleep(wait)
+                yield
+            finally:
+                state.slots.release()
+        finally:
+            state.users -= 1
@@ -0,0 +1,15 @@
+def normalize_domain(domain: str) -> str:
+    """
+    Normalize a domain or URL to a bare lowercase host name.
+
+    'https://www.Acme.com/about' and 'acme.com' both become 'acme.com', so the
+    result can be used to dedupe batches and as a cache key.
+    """
+    clean = domain.strip().lower()
+    clean = clean.replace("http://", "").replace("https://", "")
+    clean = clean.split('/')[0].split('?')[0].split('#')[0]
+    if '@' in clean:
+        clean = clean.split('@')[-1]
+    if clean.startswith("www."):
+        clean = clean[4:]
+    return clean.rstrip('.')
@@ -0,0 +1,97 @@
+import html
+import re
+from typing import List
+
+BOLD_MARKER = '**'
+BULLET_PREFIX = '• '
+
+# Inline HTML templates use, kept as written: links (href only, to web or
+# mailto addresses), line breaks, bold and italics, and entities. Any other
+# tag or attribute is escaped like text.
+INLINE_MARKUP = re.compile(
+    r'<a\s+href\s*=\s*(?:"(?P<dq>[^"<>]*)"|\'(?P<sq>[^\'<>]*)\')\s*>'
+    r'|</a\s*>'
+    r'|<br\s*/?>'
+    r'|</?(?:strong|b|em|i)\s*>'
+    r'|&(?:#\d+|#x[0-9A-Fa-f]+|[A-Za-z]+);',
+    re.IGNORECASE
+)
+LINK_SCHEMES = ('http://', 'https://', 'mailto:')
+
+
+def _is_allowed(markup: re.Match) -> bool:
+    href = markup.group('dq') if markup.group('dq') is not None else markup.group('sq')
+    return href is None or href.strip().lower().startswith(LINK_SCHEMES)
+
+
+def escape_text(text: str) -> str:
+    """HTML-escape text, keeping only the inline tags and entities listed in INLINE_MARKUP."""
+    out: List[str] = []
+    position = 0
+    for markup in INLINE_MARKUP.finditer(text):
+        if not _is_allowed(markup):
+            continue
+        out.append(html.escape(text[position:markup.start()], quote=False))
+        out.append(markup.group())
+        position = markup.end()
+    out.append(html.escape(text[position:], quote=False))
+    return ''.join(out)
+
+
+def render_body_html(body: str) -> str:
+    """
+    Render a draft body to HTML in one pass over its lines.
+
+    Supports the formatting the templates use: **bold** text, lines
+    starting with '• ' as bullet points (consecutive ones form one list)
+    and line breaks. The inline tags templates use, such as the signature's
+    <a href> links, and entities are kept; everything else, including any
+    other markup, is HTML-escaped. Bold markers pair up across the whole
+    body, as before, but an open <strong> is closed at the end of each line
+    and reopened on the next so the markup stays nested; an unpaired final
+    marker is kept as literal text.
+    """
+    # Markers that have a partner; a final odd one is left as text
+    paired_markers = body.count(BOLD_MARKER) // 2 * 2
+
+    out: List[str] = []
+    markers_seen = 0
+    bold = False
+    in_list = False
+    previous_was_item = False
+
+    for index, line in enumerate(body.split('\n')):
+        is_item = line.startswith(BULLET_PREFIX)
+        if is_item:
+            line = line[len(BULLET_PREFIX):]
+            out.append('<li>' if in_list else '<ul><li>')
+            in_list = True
+        else:
+            if in_list:
+                out.append('</ul>')
+                in_list = False
+            elif index > 0 and not previous_was_item:
+                out.append('<br>')
+        previous_was_item = is_item
+
+        if bold:
+            out.append('<strong>')
+        segments = line.split(BOLD_MARKER)
+        out.append(escape_text(segments[0]))
+        for segment in segments[1:]:
+            if markers_seen < paired_markers:
+                out.append('</strong>' if bold else '<strong>')
+                bold = not bold
+            else:
+                out.append(html.escape(BOLD_MARKER, quote=False))
+            markers_seen += 1
+            out.append(escape_text(segment))
+        if bold:
+            out.append('</strong>')
+
+        if is_item:
+            out.append('</li>')
+
+    if in_list:
+        out.append('</ul>')
+    return ''.join(out)
@@ -1,22 +1,39 @@
 import os
 import pickle
 import base64
+import datetime
+import threading
+import time
+import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from email.mime.application import MIMEApplication
+from typing import Any, Callable, Dict, List
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest, build_http
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
 from dotenv import load_dotenv
+from email_renderer import render_body_html
+from metrics import GMAIL_DRAFT_SECONDS, GMAIL_DRAFTS
 
 # Load environment variables
 load_dotenv()
 
 # If modifying these scopes, delete the token.pickle file.
 SCOPES = ['https://www.googleapis.com/auth/gmail.compose']
-TOKEN_FILE = 'token.pickle'
+TOKEN_FILE = os.getenv('GMAIL_TOKEN_FILE', 'token.pickle')
+# Refresh the access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = float(os.getenv('GMAIL_TOKEN_REFRESH_MARGIN', '300'))
+# Drafts per batch request (Gmail accepts up to 100, but recommends 50 or fewer)
+BATCH_SIZE = int(os.getenv('GMAIL_BATCH_SIZE', '50'))
+# Point the API and its batch endpoint somewhere else, e.g. a local stand-in
+GMAIL_API_ENDPOINT = os.getenv('GMAIL_API_ENDPOINT')
+GMAIL_BATCH_URI = os.getenv('GMAIL_BATCH_URI')
 REDIRECT_URI = 'http://127.0.0.1:63924'
 
 # Get credentials from environment variables
@@ -27,42 +44,126 @@ GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 SIGNATURE_IMAGE_PATH = os.path.join(os.path.dirname(__file__), 'assets', 'signature.png')
 COMPANY_PDF_PATH = os.path.join(os.path.dirname(__file__), 'assets', 'company_pdfs', 'Decodes.pdf')
 
-def get_gmail_service():
-    """Get authenticated Gmail API service."""
-    creds = None
-    
-    # Load token from file if it exists
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
-    
-    # If credentials don't exist or are invalid, get new ones
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Create flow using client ID and secret from environment variables
-            flow = Flow.from_client_config(
-                {
-                    "web": {
-                        "client_id": GOOGLE_CLIENT_ID,
-                        "client_secret": GOOGLE_CLIENT_SECRET,
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token",
-                        "redirect_uris": [REDIRECT_URI]
-                    }
-                },
-                SCOPES
-            )
-            # Use the specific redirect URI allowed in GCP
-            flow.redirect_uri = REDIRECT_URI
-            creds = flow.run_local_server(port=63924)
+class GmailServiceManager:
+    """
+    Process-wide owner of the Gmail credentials and API service.
+
+    The token is read from disk once, refreshed shortly before it expires
+    (and written back), and the service built from it is kept, so its
+    discovery document is processed once. Each thread keeps its own
+    authorized HTTP transport, so its connections are reused by every draft
+    it sends without threads waiting on each other.
+    """
+
+    def __init__(self, token_file: str = TOKEN_FILE, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.token_file = token_file
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+        self._creds = None
+        self._service = None
+        self._local = threading.local()
+
+    def _load_credentials(self):
+        creds = None
+        
+        # Load token from file if it exists
+        if os.path.exists(self.token_file):
+            with open(self.token_file, 'rb') as token:
+                creds = pickle.load(token)
         
-        # Save the credentials for the next run
-        with open(TOKEN_FILE, 'wb') as token:
+        # If credentials don't exist or are invalid, get new ones
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                # Create flow using client ID and secret from environment variables
+                flow = Flow.from_client_config(
+                    {
+                        "web": {
+                            "client_id": GOOGLE_CLIENT_ID,
+                            "client_secret": GOOGLE_CLIENT_SECRET,
+                            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                            "token_uri": "https://oauth2.googleapis.com/token",
+                            "redirect_uris": [REDIRECT_URI]
+                        }
+                    },
+                    SCOPES
+                )
+                # Use the specific redirect URI allowed in GCP
+                flow.redirect_uri = REDIRECT_URI
+                creds = flow.run_local_server(port=63924)
+            
+            self._save_credentials(creds)
+        
+        return creds
+
+    def _save_credentials(self, creds) -> None:
+        with open(self.token_file, 'wb') as token:
             pickle.dump(creds, token)
-    
-    return build('gmail', 'v1', credentials=creds)
+
+    def _expires_soon(self) -> bool:
+        if not self._creds.valid:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        expiry = self._creds.expiry
+        return expiry is not None and expiry - datetime.datetime.utcnow() < self.refresh_margin
+
+    def get_service(self):
+        """Return the shared Gmail service, loading or refreshing credentials as needed."""
+        with self._lock:
+            try:
+                if self._creds is None:
+                    self._creds = self._load_credentials()
+                elif self._expires_soon():
+                    if self._creds.refresh_token:
+                        # Refreshed in place, so the existing service picks up the new token
+                        self._creds.refresh(Request())
+                        self._save_credentials(self._creds)
+                    else:
+                        self._creds = self._load_credentials()
+                        self._service = None
+            except Exception:
+                self._creds = None
+                self._service = None
+                raise
+
+            if self._service is None:
+                client_options = {'api_endpoint': GMAIL_API_ENDPOINT} if GMAIL_API_ENDPOINT else None
+                self._service = build(
+                    'gmail', 'v1', credentials=self._creds, cache_discovery=False, client_options=client_options
+                )
+            return self._service
+
+    def get_http(self) -> AuthorizedHttp:
+        """
+        Return the calling thread's authorized HTTP transport for API calls.
+
+        httplib2 connections aren't thread-safe, so each thread gets its own
+        transport around the shared credentials instead of using the service's.
+        """
+        self.get_service()
+        with self._lock:
+            creds = self._creds
+        if creds is None:
+            raise Exception("Gmail credentials were reset")
+        local = self._local
+        if getattr(local, 'creds', None) is not creds:
+            local.creds = creds
+            local.http = AuthorizedHttp(creds, http=build_http())
+        return local.http
+
+    def reset(self) -> None:
+        """Forget the cached credentials and service, e.g. after the token was revoked."""
+        with self._lock:
+            self._creds = None
+            self._service = None
+
+
+gmail_service_manager = GmailServiceManager()
+
+def get_gmail_service():
+    """Get authenticated Gmail API service."""
+    return gmail_service_manager.get_service()
 
 def check_auth():
     """Check if the user is authenticated."""
@@ -101,107 +202,245 @@ def get_authorization_url():
     except Exception as e:
         return f"Error: {str(e)}"
 
+class StaticPart:
+    """
+    A file attached to every draft, read and transfer-encoded once.
+
+    The MIME part is kept in memory and rebuilt only when the file's mtime
+    or size changes. Returns None while the file doesn't exist.
+    """
+
+    def __init__(self, path: str, make_part: Callable[[bytes], Any]):
+        self.path = path
+        self._make_part = make_part
+        self._lock = threading.Lock()
+        self._version = None
+        self._part = None
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version != self._version:
+                with open(self.path, 'rb') as f:
+                    self._part = self._make_part(f.read())
+                self._version = version
+            return self._part
+
+def _make_signature_part(data: bytes):
+    img = MIMEImage(data)
+    img.add_header('Content-ID', '<signature>')
+    img.add_header('Content-Disposition', 'inline')
+    return img
+
+def _make_company_pdf_part(data: bytes):
+    pdf = MIMEApplication(data)
+    pdf.add_header(
+        'Content-Disposition', 
+        'attachment', 
+        filename='Decodes.pdf'
+    )
+    return pdf
+
+signature_part = StaticPart(SIGNATURE_IMAGE_PATH, _make_signature_part)
+company_pdf_part = StaticPart(COMPANY_PDF_PATH, _make_company_pdf_part)
+
+def _static_parts():
+    return [part for part in (signature_part.get(), company_pdf_part.get()) if part is not None]
+
+def build_message(recipient_email, subject, body, attachment_path=None, include_static_parts=True):
+    """Build the MIME message for a draft: text and HTML bodies, signature and attachments."""
+    # Create multipart message
+    message = MIMEMultipart('mixed')
+    message['to'] = recipient_email
+    message['subject'] = subject
+    
+    # Create the multipart/alternative part to hold the text and HTML versions
+    msg_alternative = MIMEMultipart('alternative')
+    
+    # Add text body (plain text version)
+    text_part = MIMEText(body, 'plain')
+    msg_alternative.attach(text_part)
+    
+    # Convert Markdown-style formatting to HTML
+    formatted_body = render_body_html(body)
+    
+    # Add HTML body with signature
+    html_body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6;">
+    {formatted_body}
+    <br><br>
+    <img src="cid:signature" alt="Signature" style="max-width: 200px;">
+    </body>
+    </html>
+    """
+    html_part = MIMEText(html_body, 'html')
+    msg_alternative.attach(html_part)
+    
+    # Attach the alternative part to the main message
+    message.attach(msg_alternative)
+    
+    # Add signature image and Decodes.pdf to every email
+    if include_static_parts:
+        for part in _static_parts():
+            message.attach(part)
+    
+    # Add any additional attachment if provided
+    if attachment_path and os.path.exists(attachment_path):
+        with open(attachment_path, 'rb') as f:
+            attachment = MIMEApplication(f.read())
+            attachment.add_header(
+                'Content-Disposition', 
+                'attachment', 
+                filename=os.path.basename(attachment_path)
+            )
+            message.attach(attachment)
+    
+    return message
+
+def encode_message(message):
+    """Encode a MIME message as the base64url 'raw' value the Gmail API expects."""
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+# Top-level boundary for drafts without a per-draft attachment. Being fixed,
+# everything from the signature part to the end of the message is the same
+# bytes in every draft.
+STATIC_BOUNDARY = '==' + uuid.uuid4().hex + '=='
+_static_tail_lock = threading.Lock()
+_static_tail = (None, None, None)
+
+def _encoded_static_tail(parts, closing: bytes) -> bytes:
+    """base64url of the static parts plus the closing boundary, encoded once per parts version."""
+    global _static_tail
+    with _static_tail_lock:
+        cached_parts, cached_closing, encoded = _static_tail
+        if (cached_closing != closing or cached_parts is None or len(cached_parts) != len(parts)
+                or any(cached is not part for cached, part in zip(cached_parts, parts))):
+            delimiter = b'\n--' + STATIC_BOUNDARY.encode() + b'\n'
+            tail = b''.join(delimiter + part.as_bytes() for part in parts) + closing
+            encoded = base64.urlsafe_b64encode(tail)
+            _static_tail = (parts, closing, encoded)
+        return encoded
+
+def encode_draft(recipient_email, subject, body, attachment_path=None):
+    """
+    Build and encode a draft message for the Gmail API.
+
+    The signature and company PDF are spliced in as base64url that was
+    encoded once, so each draft only serializes and encodes its own
+    headers and body. Drafts with a per-draft attachment take the plain
+    path through build_message and encode_message.
+    """
+    parts = _static_parts()
+    if attachment_path or not parts or STATIC_BOUNDARY in body or STATIC_BOUNDARY in subject:
+        return encode_message(build_message(recipient_email, subject, body, attachment_path))
+    
+    message = build_message(recipient_email, subject, body, include_static_parts=False)
+    message.set_boundary(STATIC_BOUNDARY)
+    data = message.as_bytes()
+    split_at = data.rindex(b'\n--' + STATIC_BOUNDARY.encode() + b'--')
+    head, closing = data[:split_at], data[split_at:]
+    # Pad to whole base64 groups so the two encodings join cleanly; the blank
+    # lines land in the ignored epilogue of the text/HTML part
+    head += b'\n' * (-len(head) % 3)
+    return (base64.urlsafe_b64encode(head) + _encoded_static_tail(parts, closing)).decode()
+
 def create_draft(recipient_email, subject, body, attachment_path=None):
     """Create an email draft in Gmail with optional attachment and signature."""
+    started = time.monotonic()
+    outcome = "error"
     try:
         service = get_gmail_service()
+        http = gmail_service_manager.get_http()
         
-        # Create multipart message
-        message = MIMEMultipart('mixed')
-        message['to'] = recipient_email
-        message['subject'] = subject
-        
-        # Create the multipart/alternative part to hold the text and HTML versions
-        msg_alternative = MIMEMultipart('alternative')
-        
-        # Add text body (plain text version)
-        text_part = MIMEText(body, 'plain')
-        msg_alternative.attach(text_part)
-        
-        # Convert Markdown-style formatting to HTML
-        # Handle bold text
-        formatted_body = body.replace('**', '<strong>', 1)
-        while '**' in formatted_body:
-            formatted_body = formatted_body.replace('**', '</strong>', 1)
-            if '**' in formatted_body:
-                formatted_body = formatted_body.replace('**', '<strong>', 1)
-        
-        # Handle bullet points
-        formatted_body = formatted_body.replace('\n• ', '\n<li>')
-        formatted_body = formatted_body.replace('\n</li>', '</li>\n')
-        
-        # If there are bullet points, wrap them in a ul tag
-        if '<li>' in formatted_body:
-            # Split the text into lines
-            lines = formatted_body.split('\n')
-            in_list = False
-            for i in range(len(lines)):
-                if lines[i].strip().startswith('<li>') and not in_list:
-                    lines[i] = '<ul>' + lines[i]
-                    in_list = True
-                elif in_list and (i == len(lines) - 1 or not lines[i+1].strip().startswith('<li>')):
-                    lines[i] = lines[i] + '</ul>'
-                    in_list = False
-            formatted_body = '\n'.join(lines)
-        
-        # Convert newlines to <br> tags
-        formatted_body = formatted_body.replace('\n', '<br>')
-        
-        # Add HTML body with signature
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-        {formatted_body}
-        <br><br>
-        <img src="cid:signature" alt="Signature" style="max-width: 200px;">
-        </body>
-        </html>
-        """
-        html_part = MIMEText(html_body, 'html')
-        msg_alternative.attach(html_part)
-        
-        # Attach the alternative part to the main message
-        message.attach(msg_alternative)
-        
-        # Add signature image
-        if os.path.exists(SIGNATURE_IMAGE_PATH):
-            with open(SIGNATURE_IMAGE_PATH, 'rb') as f:
-                img = MIMEImage(f.read())
-                img.add_header('Content-ID', '<signature>')
-                img.add_header('Content-Disposition', 'inline')
-                message.attach(img)
-        
-        # Add Decodes.pdf to every email
-        if os.path.exists(COMPANY_PDF_PATH):
-            with open(COMPANY_PDF_PATH, 'rb') as f:
-                pdf = MIMEApplication(f.read())
-                pdf.add_header(
-                    'Content-Disposition', 
-                    'attachment', 
-                    filename='Decodes.pdf'
-                )
-                message.attach(pdf)
-        
-        # Add any additional attachment if provided
-        if attachment_path and os.path.exists(attachment_path):
-            with open(attachment_path, 'rb') as f:
-                attachment = MIMEApplication(f.read())
-                attachment.add_header(
-                    'Content-Disposition', 
-                    'attachment', 
-                    filename=os.path.basename(attachment_path)
-                )
-                message.attach(attachment)
-        
-        # Encode the message
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+        # Build and encode the message
+        encoded_message = encode_draft(recipient_email, subject, body, attachment_path)
         
         # Create the draft
         draft = service.users().drafts().create(
             userId='me',
             body={'message': {'raw': encoded_message}}
-        ).execute()
+        ).execute(http=http)
         
+        outcome = "success"
         return draft['id']
+    except RefreshError as e:
+        # The token was revoked or can no longer be refreshed; reload it next time
+        outcome = "auth_error"
+        gmail_service_manager.reset()
+        raise Exception(f"Failed to create draft: {str(e)}")
     except Exception as e:
-        raise Exception(f"Failed to create draft: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Failed to create draft: {str(e)}")
+    finally:
+        GMAIL_DRAFT_SECONDS.labels("single", outcome).observe(time.monotonic() - started)
+        GMAIL_DRAFTS.labels("single", outcome).inc()
+
+
+def _new_batch(service, callback):
+    if GMAIL_BATCH_URI:
+        return BatchHttpRequest(callback=callback, batch_uri=GMAIL_BATCH_URI)
+    return service.new_batch_http_request(callback=callback)
+
+def create_drafts(drafts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create many drafts with Gmail batch requests, BATCH_SIZE drafts per HTTP round trip.
+
+    Each item needs recipient_email, subject and body. Returns one result per
+    item, in order, with either its draft_id or the error that item hit; one
+    failing draft doesn't fail the rest.
+    """
+    service = get_gmail_service()
+    http = gmail_service_manager.get_http()
+    results: List[Dict[str, Any]] = [
+        {"recipient_email": draft.get("recipient_email"), "success": False} for draft in drafts
+    ]
+    
+    def on_response(request_id, response, exception):
+        result = results[int(request_id)]
+        if exception is not None:
+            result["error"] = str(exception)
+        else:
+            result["success"] = True
+            result["draft_id"] = response['id']
+    
+    for chunk_start in range(0, len(drafts), BATCH_SIZE):
+        batch = _new_batch(service, on_response)
+        request_ids = []
+        for index in range(chunk_start, min(chunk_start + BATCH_SIZE, len(drafts))):
+            draft = drafts[index]
+            try:
+                encoded_message = encode_draft(draft["recipient_email"], draft["subject"], draft["body"])
+            except Exception as e:
+                results[index]["error"] = f"Failed to build message: {str(e)}"
+                continue
+            batch.add(
+                service.users().drafts().create(userId='me', body={'message': {'raw': encoded_message}}),
+                request_id=str(index)
+            )
+            request_ids.append(index)
+        
+        if not request_ids:
+            continue
+        started = time.monotonic()
+        try:
+            batch.execute(http=http)
+            GMAIL_DRAFT_SECONDS.labels("batch", "success").observe(time.monotonic() - started)
+        except Exception as e:
+            GMAIL_DRAFT_SECONDS.labels("batch", "error").observe(time.monotonic() - started)
+            # The whole round trip failed, so every draft in it did
+            for index in request_ids:
+                results[index]["error"] = str(e)
+            if isinstance(e, RefreshError):
+                # Token revoked: reload it next time and don't send the remaining drafts
+                gmail_service_manager.reset()
+                break
+    
+    for result in results:
+        if not result["success"] and "error" not in result:
+            result["error"] = "Not sent: Gmail authorization failed"
+        GMAIL_DRAFTS.labels("batch", "success" if result["success"] else "error").inc()
+    return results
@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Where campaign jobs, their per-domain checkpoints and their events are stored
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'campaign_jobs.db')
+# Seconds a finished job, its checkpoints and its events are kept
+JOB_RETENTION = float(os.getenv('CAMPAIGN_JOB_RETENTION', '3600'))
+
+
+class JobStore:
+    """
+    SQLite store that lets campaign jobs survive restarts.
+
+    A job row holds the request that started it. Each domain in the job is a
+    task row holding the outputs of every stage completed so far, so work
+    that already succeeded (including paid LLM calls) is never repeated.
+    Events are stored too, so clients can keep resuming their event streams
+    with Last-Event-ID after the server comes back. Finished jobs are
+    removed by prune() once they are older than the retention period.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, retention: float = JOB_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS tasks (
+                    job_id TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, domain)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS events (
+                    job_id TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, id)
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def create_job(self, job_id: str, params: Dict[str, Any], created_at: float,
+                   tasks: Dict[str, Dict[str, Any]]) -> None:
+        """Store a new job and one pending task per domain."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO jobs (id, params, status, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(params), "running", created_at)
+            )
+            conn.executemany(
+                "INSERT INTO tasks (job_id, domain, state, outputs, updated_at) VALUES (?, ?, ?, '{}', ?)",
+                [(job_id, domain, json.dumps(state), now) for domain, state in tasks.items()]
+            )
+            conn.commit()
+
+    def checkpoint(self, job_id: str, domain: str, state: Dict[str, Any],
+                   outputs: Dict[str, Any], done: bool) -> None:
+        """Record a domain's state and stage outputs after a stage finishes."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE tasks SET state = ?, outputs = ?, done = ?, updated_at = ? WHERE job_id = ? AND domain = ?",
+                (json.dumps(state), json.dumps(outputs), int(done), time.time(), job_id, domain)
+            )
+            conn.commit()
+
+    def add_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO events (job_id, id, data) VALUES (?, ?, ?)",
+                (job_id, event["id"], json.dumps(event))
+            )
+            conn.commit()
+
+    def finish_job(self, job_id: str, status: str, finished_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                (status, finished_at, job_id)
+            )
+            conn.commit()
+
+    def prune(self) -> int:
+        """Delete jobs that finished more than retention seconds ago; returns how many."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            conn = self._connection()
+            expired = "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?"
+            conn.execute(f"DELETE FROM events WHERE job_id IN ({expired})", (cutoff,))
+            conn.execute(f"DELETE FROM tasks WHERE job_id IN ({expired})", (cutoff,))
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            ).rowcount
+            conn.commit()
+            return deleted
+
+    def unfinished_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Every job that was still running when the process stopped.
+
+        Each entry has the job's id, params and created_at, its tasks as
+        {domain: {"state", "outputs", "done"}} and its events in order.
+        """
+        with self._lock:
+            conn = self._connection()
+            job_rows = conn.execute(
+                "SELECT id, params, created_at FROM jobs WHERE finished_at IS NULL ORDER BY created_at"
+            ).fetchall()
+            jobs = []
+            for job_id, params, created_at in job_rows:
+                task_rows = conn.execute(
+                    "SELECT domain, state, outputs, done FROM tasks WHERE job_id = ? ORDER BY rowid",
+                    (job_id,)
+                ).fetchall()
+                event_rows = conn.execute(
+                    "SELECT data FROM events WHERE job_id = ? ORDER BY id", (job_id,)
+                ).fetchall()
+                jobs.append({
+                    "id": job_id,
+                    "params": json.loads(params),
+                    "created_at": created_at,
+                    "tasks": {
+                        domain: {"state": json.loads(state), "outputs": json.loads(outputs), "done": bool(done)}
+                        for domain, state, outputs, done in task_rows
+                    },
+                    "events": [json.loads(data) for (data,) in event_rows]
+                })
+            return jobs
@@ -0,0 +1,68 @@
+import re
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+
+_WORD = re.compile(r'\w+')
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter
+# but that str.lower() does not turn into one
+_ASCII_CASE_FOLDS = str.maketrans({'İ': 'i', 'ı': 'i', 'ſ': 's', 'K': 'k'})
+
+
+def _fold(word: str) -> str:
+    return word.translate(_ASCII_CASE_FOLDS).lower()
+
+
+class KeywordMatcher:
+    """
+    Finds whole-word, case-insensitive keyword hits in one pass over a text.
+
+    Keywords are indexed by their first word when the matcher is built. The
+    text is then split into words once, and only keywords whose first word
+    occurs are checked further, so the cost no longer grows with one search
+    per keyword. Keywords keep the priority of their position in the list:
+    first_match() returns the same keyword as trying
+    re.search(r'\\b<keyword>\\b', text, re.IGNORECASE) for each keyword in
+    turn and stopping at the first hit.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._by_first_word: Dict[str, List[Tuple[int, Pattern]]] = {}
+        for index, keyword in enumerate(self.keywords):
+            first_word = _WORD.match(keyword)
+            if first_word is None:
+                raise ValueError(f"Keyword must start with a word character: {keyword!r}")
+            # The rest of the keyword is only checked where its first word occurs
+            pattern = re.compile(re.escape(keyword) + r'\b', re.IGNORECASE)
+            self._by_first_word.setdefault(_fold(first_word.group(0)), []).append((index, pattern))
+
+    def _hits(self, text: str) -> Iterator[int]:
+        # A keyword can only start where a word starts, and candidates for each
+        # word are in priority order, so the first one that matches wins there
+        for word in _WORD.finditer(text):
+            candidates = self._by_first_word.get(_fold(word.group(0)))
+            if candidates is None:
+                continue
+            for index, pattern in candidates:
+                if pattern.match(text, word.start()):
+                    yield index
+                    break
+
+    def first_match_index(self, text: str) -> Optional[int]:
+        """Return the index of the highest-priority keyword in text, or None."""
+        best = None
+        for index in self._hits(text):
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def first_match(self, text: str) -> Optional[str]:
+        """Return the highest-priority keyword found in text, or None."""
+        index = self.first_match_index(text)
+        return None if index is None else self.keywords[index]
+
+    def contains_any(self, text: str) -> bool:
+        """Return True if any keyword appears in text."""
+        return next(self._hits(text), None) is not None
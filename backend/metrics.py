@@ -0,0 +1,92 @@
+from typing import Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets in seconds, from cached page reads up to slow model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+SCRAPE_FETCH_SECONDS = Histogram(
+    'scrape_fetch_seconds', 'Time to get one page, by how it was served',
+    ['outcome'], buckets=LATENCY_BUCKETS
+)
+LLM_CALL_SECONDS = Histogram(
+    'llm_call_seconds', 'Duration of each model call, by kind of call',
+    ['call', 'model', 'outcome'], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    'llm_tokens', 'Tokens sent to and received from the model',
+    ['call', 'model', 'direction']
+)
+ANALYSIS_PIPELINE_SECONDS = Histogram(
+    'analysis_pipeline_seconds', 'Duration of a full company analysis run',
+    ['mode', 'outcome', 'fallback'], buckets=LATENCY_BUCKETS
+)
+GMAIL_DRAFT_SECONDS = Histogram(
+    'gmail_draft_seconds', 'Duration of a draft creation round trip (one draft, or one batch)',
+    ['mode', 'outcome'], buckets=LATENCY_BUCKETS
+)
+GMAIL_DRAFTS = Counter(
+    'gmail_drafts', 'Drafts created or failed',
+    ['mode', 'outcome']
+)
+CAMPAIGN_STAGE_SECONDS = Histogram(
+    'campaign_stage_seconds', 'Duration of each campaign job stage per domain',
+    ['stage', 'status'], buckets=LATENCY_BUCKETS
+)
+
+
+def observe_llm_call(call: str, model: str, outcome: str, seconds: float,
+                     sent: int = 0, received: int = 0) -> None:
+    LLM_CALL_SECONDS.labels(call, model, outcome).observe(seconds)
+    if sent:
+        LLM_TOKENS.labels(call, model, 'sent').inc(sent)
+    if received:
+        LLM_TOKENS.labels(call, model, 'received').inc(received)
+
+
+class CacheCollector:
+    """
+    Exposes the counters the caches already keep, read when /metrics is scraped.
+
+    Covers every AnalysisCache and the fetcher's PageCache, so cache code
+    doesn't need to know about Prometheus.
+    """
+
+    def describe(self) -> Iterator:
+        # Without this the registry calls collect() on registration, which
+        # imports page_fetcher while it may still be importing this module
+        return iter(())
+
+    def collect(self) -> Iterator:
+        from analysis_cache import get_cache_stats
+        import page_fetcher
+
+        lookups = CounterMetricFamily('cache_lookups', 'Cache lookups by cache and result', labels=['cache', 'result'])
+        refreshes = CounterMetricFamily('cache_refreshes', 'Background refreshes of stale records', labels=['cache'])
+        hit_rate = GaugeMetricFamily('cache_hit_rate', 'Share of lookups served from the cache', labels=['cache'])
+
+        for namespace, stats in get_cache_stats().items():
+            for result in ('hits', 'stale_hits', 'misses'):
+                lookups.add_metric([namespace, result], stats[result])
+            refreshes.add_metric([namespace], stats['refreshes'])
+            hit_rate.add_metric([namespace], stats['hit_rate'])
+
+        fetcher = page_fetcher._fetcher
+        if fetcher is not None and fetcher.cache is not None:
+            stats = fetcher.cache.stats()
+            for result in ('hits', 'revalidated', 'misses', 'offline_hits'):
+                lookups.add_metric(['pages', result], stats[result])
+            hit_rate.add_metric(['pages'], stats['hit_rate'])
+
+        yield lookups
+        yield refreshes
+        yield hit_rate
+
+
+REGISTRY.register(CacheCollector())
+
+
+def render_metrics():
+    """The current metrics in the Prometheus text format, and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,145 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import observe_llm_call
+from prompt_budget import TokenBudgetExceeded, count_tokens, ledger
+
+load_dotenv()
+
+# OpenAI-compatible API root; point at a proxy or a local server to override
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+# Seconds to wait for a connection, and for each read of a response
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '60'))
+# Retries after a 429, a 5xx or a network error, with jittered exponential backoff
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '4'))
+OPENAI_BACKOFF_BASE = float(os.getenv('OPENAI_BACKOFF_BASE', '0.5'))
+OPENAI_BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', '20'))
+# Connections kept open to the API across requests
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OpenAIHTTPClient:
+    """
+    Blocking client for the OpenAI REST API, shared by the synchronous callers.
+
+    One pooled httpx.Client keeps connections alive between calls, so only
+    the first request pays for the TLS handshake. Every request has connect
+    and read timeouts, and rate limits, server errors and network errors
+    are retried with full-jitter exponential backoff (honouring Retry-After).
+    httpx clients are thread-safe, so executor threads share this one.
+    """
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, api_key: Optional[str] = None,
+                 max_retries: int = OPENAI_MAX_RETRIES, backoff_base: float = OPENAI_BACKOFF_BASE,
+                 backoff_max: float = OPENAI_BACKOFF_MAX):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.client = httpx.Client(
+            base_url=base_url,
+            headers={
+                "Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY', '')}",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+            )
+        )
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            try:
+                return min(float(response.headers['retry-after']), self.backoff_max)
+            except (KeyError, ValueError):
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a JSON payload and return the decoded JSON response."""
+        attempt = 0
+        while True:
+            try:
+                response = self.client.post(path, json=payload)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                delay = self._backoff(attempt, response)
+                print(f"OpenAI returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            self.retries += 1
+            time.sleep(delay)
+
+    def chat_completion(self, payload: Dict[str, Any], call: str = "chat_completion",
+                        domain: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create a chat completion, recording its token use under call.
+
+        When a domain is given, its token ceiling is checked first and
+        TokenBudgetExceeded is raised instead of making the call.
+        """
+        model = payload.get("model", "unknown")
+        started = time.monotonic()
+        try:
+            if domain and ledger.ceiling:
+                estimated = sum(count_tokens(message.get("content") or "") for message in payload.get("messages", []))
+                ledger.check(domain, estimated + payload.get("max_tokens", 0))
+            result = self.post("/chat/completions", payload)
+        except TokenBudgetExceeded:
+            observe_llm_call(call, model, "over_budget", time.monotonic() - started)
+            raise
+        except Exception:
+            observe_llm_call(call, model, "error", time.monotonic() - started)
+            raise
+        usage = result.get("usage") or {}
+        sent, received = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        ledger.record(call, domain, sent, received)
+        observe_llm_call(call, model, "success", time.monotonic() - started, sent, received)
+        return result
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_client: Optional[OpenAIHTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_openai_http() -> OpenAIHTTPClient:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAIHTTPClient()
+        return _client
+
+
+def close_openai_http() -> None:
+    """Close the shared client and its connection pool."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def completion_text(result: Dict[str, Any]) -> str:
+    """The text of the first choice of a chat completion response."""
+    return result["choices"][0]["message"]["content"]
@@ -0,0 +1,210 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Where fetched pages are stored
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR', 'page_cache')
+# Pages younger than this are served from disk without contacting the site
+PAGE_CACHE_FRESHNESS = float(os.getenv('PAGE_CACHE_FRESHNESS', str(24 * 3600)))
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+# Pages older than this are deleted rather than kept as a fallback
+PAGE_CACHE_MAX_AGE = float(os.getenv('PAGE_CACHE_MAX_AGE', str(30 * 24 * 3600)))
+# Least recently fetched pages are deleted once the cache is larger than this
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# How often (in seconds) a store also enforces the limits above
+PAGE_CACHE_PRUNE_INTERVAL = float(os.getenv('PAGE_CACHE_PRUNE_INTERVAL', '600'))
+# Unreferenced bodies and temporary files younger than this may belong to a write in progress
+ORPHAN_GRACE = 60.0
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CachedPage:
+    """A stored response: its body plus the validators needed to revalidate it."""
+
+    def __init__(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str], fetched_at: float):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that ask the server to answer 304 if the page hasn't changed."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    Content-addressed on-disk cache of fetched pages.
+
+    Each URL has a small metadata file (named by the hash of the URL) holding
+    its ETag, Last-Modified and fetch time, and pointing at a body file named
+    by the hash of the body. Pages that many URLs share, or that come back
+    unchanged, are stored once. Files are written to a temporary name and
+    renamed into place so readers never see partial writes.
+
+    Every prune_interval seconds a store also prunes the cache: pages older
+    than max_age go, then the least recently fetched ones until it's under
+    max_bytes, and bodies no page points at any more are deleted. Methods
+    do blocking file I/O, so async callers run them in an executor.
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_DIR, freshness: float = PAGE_CACHE_FRESHNESS,
+                 max_age: float = PAGE_CACHE_MAX_AGE, max_bytes: int = PAGE_CACHE_MAX_BYTES,
+                 prune_interval: float = PAGE_CACHE_PRUNE_INTERVAL):
+        self.path = path
+        self.freshness = freshness
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.offline_hits = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        os.makedirs(os.path.join(path, 'meta'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'bodies'), exist_ok=True)
+
+    def _meta_path(self, url: str) -> str:
+        return os.path.join(self.path, 'meta', _sha256(url.encode('utf-8')) + '.json')
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.path, 'bodies', digest)
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Return the stored page for url, however old, or None."""
+        try:
+            with open(self._meta_path(url), 'rb') as f:
+                meta = json.load(f)
+            with open(self._body_path(meta['body']), 'rb') as f:
+                body = f.read().decode('utf-8')
+        except (OSError, ValueError, KeyError):
+            return None
+        page = CachedPage(url, body, meta.get('etag'), meta.get('last_modified'), meta['fetched_at'])
+        return page if page.age() < self.max_age else None
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return page.age() < self.freshness
+
+    def put(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Store a 200 response body and its validators."""
+        data = body.encode('utf-8')
+        digest = _sha256(data)
+        with self._lock:
+            if not os.path.exists(self._body_path(digest)):
+                self._write(self._body_path(digest), data)
+            self._write_meta(url, digest, etag, last_modified)
+        if time.time() - self._pruned_at >= self.prune_interval:
+            self.prune()
+
+    def touch(self, page: CachedPage, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Record that the server confirmed a stored page is still current (304)."""
+        with self._lock:
+            self._write_meta(
+                page.url, _sha256(page.body.encode('utf-8')),
+                etag or page.etag, last_modified or page.last_modified
+            )
+
+    def _write_meta(self, url: str, digest: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        meta = {
+            "url": url,
+            "body": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time()
+        }
+        self._write(self._meta_path(url), json.dumps(meta).encode('utf-8'))
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _scan(self, directory: str) -> Dict[str, os.stat_result]:
+        """Stat the files in one of the cache's directories, deleting abandoned temporary files."""
+        files = {}
+        cutoff = time.time() - ORPHAN_GRACE
+        for entry in os.scandir(os.path.join(self.path, directory)):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if entry.name.endswith('.tmp'):
+                if stat.st_mtime < cutoff:
+                    self._remove(entry.path)
+            else:
+                files[entry.name] = stat
+        return files
+
+    def prune(self) -> int:
+        """Delete expired pages, the oldest pages over max_bytes and unreferenced bodies; returns pages deleted."""
+        with self._lock:
+            self._pruned_at = now = time.time()
+            pages = []
+            for name, stat in self._scan('meta').items():
+                path = os.path.join(self.path, 'meta', name)
+                try:
+                    with open(path, 'rb') as f:
+                        meta = json.load(f)
+                    pages.append((meta['fetched_at'], path, meta['body'], stat.st_size))
+                except (OSError, ValueError, KeyError):
+                    # Unreadable, so get() already treats it as missing
+                    self._remove(path)
+            bodies = self._scan('bodies')
+
+            references = collections.Counter(digest for _, _, digest, _ in pages)
+            for digest, stat in bodies.items():
+                if not references[digest] and stat.st_mtime < now - ORPHAN_GRACE:
+                    self._remove(self._body_path(digest))
+            size = sum(meta_size for _, _, _, meta_size in pages)
+            size += sum(bodies[digest].st_size for digest in references if digest in bodies)
+
+            removed = 0
+            for fetched_at, path, digest, meta_size in sorted(pages):
+                if now - fetched_at < self.max_age and size <= self.max_bytes:
+                    break
+                self._remove(path)
+                removed += 1
+                size -= meta_size
+                references[digest] -= 1
+                if not references[digest] and digest in bodies:
+                    self._remove(self._body_path(digest))
+                    size -= bodies[digest].st_size
+            self.evicted += removed
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "offline_hits": self.offline_hits,
+            "evicted": self.evicted,
+            "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            "freshness": self.freshness
+        }
@@ -0,0 +1,407 @@
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# Sections whose full text is searched for industry keywords
+INDUSTRY_SECTION_SELECTORS = ['main', '.main', '#main', '.content', '#content', 'article', '.about', '#about']
+
+# Sections that might contain achievements
+ACHIEVEMENT_SECTION_SELECTORS = [
+    '.achievements', '#achievements', '.awards', '#awards',
+    '.milestones', '#milestones', '.about-us', '#about-us',
+    '.highlights', '#highlights', '.features', '#features',
+    '.timeline', '#timeline', '.history', '#history'
+]
+
+# Sections that might contain a company description
+ABOUT_SECTION_SELECTORS = [
+    '.about', '#about', '.about-us', '#about-us',
+    '.company', '#company', '.description', '#description',
+    '.mission', '#mission', '.vision', '#vision'
+]
+
+# Sections that might list products or services
+PRODUCT_SECTION_SELECTORS = [
+    '.products', '#products', '.services', '#services',
+    '.offerings', '#offerings', '.solutions', '#solutions',
+    '.shop', '#shop', '.catalog', '#catalog'
+]
+
+# LinkedIn-style industry labels
+INDUSTRY_TAG_CLASSES = {'org-top-card-summary__info-item', 'industry-tag'}
+
+# Elements inside a product section that usually hold a product name
+PRODUCT_HEADING_TAGS = {'h2', 'h3', 'h4'}
+PRODUCT_HEADING_CLASSES = {'product-title', 'product-name'}
+
+# Link targets that usually point at products or categories
+PRODUCT_LINK_MARKERS = ('product', 'shop', 'category')
+
+# Elements that never have contents (matches Beautiful Soup's html.parser builder)
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'
+}
+# Text inside these elements is only text of the element itself, never of its ancestors
+STRING_CONTAINER_ELEMENTS = {'script', 'style', 'template', 'rt', 'rp'}
+# Whitespace-only text inside these elements is kept as-is
+PRESERVE_WHITESPACE_ELEMENTS = {'pre', 'textarea'}
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def _index_selectors(selectors: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, List[str]], Dict[str, List[str]]]:
+    """Group simple selectors ('tag', '.class', '#id') by what they match on."""
+    by_tag, by_class, by_id = {}, {}, {}
+    for selector in selectors:
+        if selector.startswith('.'):
+            by_class.setdefault(selector[1:], []).append(selector)
+        elif selector.startswith('#'):
+            by_id.setdefault(selector[1:], []).append(selector)
+        else:
+            by_tag.setdefault(selector, []).append(selector)
+    return by_tag, by_class, by_id
+
+SECTION_SELECTORS = list(dict.fromkeys(
+    INDUSTRY_SECTION_SELECTORS + ACHIEVEMENT_SECTION_SELECTORS + ABOUT_SECTION_SELECTORS + PRODUCT_SECTION_SELECTORS
+))
+_SECTIONS_BY_TAG, _SECTIONS_BY_CLASS, _SECTIONS_BY_ID = _index_selectors(SECTION_SELECTORS)
+
+
+def _text(parts: List[str]) -> str:
+    return ''.join(parts)
+
+
+class Section:
+    """Text collected from the first element matching a section selector."""
+
+    def __init__(self, parts: List[str]):
+        self.parts = parts
+        self._li_parts: List[List[str]] = []
+        self._p_parts: List[List[str]] = []
+        self._heading_parts: List[List[str]] = []
+
+    @property
+    def text(self) -> str:
+        return _text(self.parts)
+
+    @property
+    def li_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._li_parts]
+
+    @property
+    def p_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._p_parts]
+
+    @property
+    def heading_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._heading_parts]
+
+
+class PageSignals:
+    """
+    Everything the company-info extractors need from one HTML page.
+
+    Text values follow Beautiful Soup's get_text() rules: script, style and
+    template contents count only towards those elements themselves, comments
+    are excluded, and whitespace-only runs collapse to a single space or
+    newline. Lists are in document order.
+    """
+
+    def __init__(self):
+        self.title_string: Optional[str] = None
+        self.meta_description: Optional[str] = None
+        self.meta_keywords: Optional[str] = None
+        self.logo_alts: List[str] = []
+        self.sections: Dict[str, Section] = {}
+        self.industry_tag_text: Optional[str] = None
+        self.organization_names: List[str] = []
+        self._h1_parts: List[List[str]] = []
+        self._p_parts: List[List[str]] = []
+        self._body_p_parts: List[List[str]] = []
+        self._product_link_parts: List[List[str]] = []
+        self._industry_tag_parts: Optional[List[str]] = None
+        self._organizations: List[List[Optional[List[str]]]] = []
+
+    @property
+    def h1_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._h1_parts]
+
+    @property
+    def paragraph_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._p_parts]
+
+    @property
+    def body_paragraph_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._body_p_parts]
+
+    @property
+    def product_link_texts(self) -> List[str]:
+        return [_text(parts) for parts in self._product_link_parts]
+
+    def _finish(self) -> None:
+        if self._industry_tag_parts is not None:
+            self.industry_tag_text = _text(self._industry_tag_parts)
+        # Names of schema.org organizations that have one, in document order
+        self.organization_names = [
+            _text(organization[0]) for organization in self._organizations if organization[0] is not None
+        ]
+
+
+class _OpenElement:
+    __slots__ = ('tag', 'kind', 'parts', 'children', 'section', 'organization', 'flags')
+
+    def __init__(self, tag: str, kind: Optional[str]):
+        self.tag = tag
+        # Which strings count as this element's text: None for ordinary text,
+        # or the tag name for string containers like script and style
+        self.kind = kind
+        self.parts: Optional[List[str]] = None
+        # Child strings and child elements' children, kept only inside the title
+        self.children: Optional[list] = None
+        self.section: Optional[Section] = None
+        self.organization: Optional[List[Optional[List[str]]]] = None
+        self.flags = 0
+
+
+_STRING_CONTAINER = 1
+_PRESERVE_WHITESPACE = 2
+_BODY = 4
+_TITLE = 8
+
+
+def _single_string(children: list) -> Optional[str]:
+    # Like Tag.string: the only child string, looking through only-child elements
+    if len(children) != 1:
+        return None
+    child = children[0]
+    return child if isinstance(child, str) else _single_string(child)
+
+
+class PageExtractor(HTMLParser):
+    """
+    Collects PageSignals in a single streaming pass over the markup.
+
+    No tree is built. Each element that some extractor cares about gets a
+    text buffer when it opens, and every run of text is appended to the
+    buffers of all currently open elements that want it. Unclosed and
+    mis-nested tags are handled the way Beautiful Soup's html.parser
+    builder handles them, so the collected text matches what get_text()
+    on a parsed tree would return.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.signals = PageSignals()
+        self._stack: List[_OpenElement] = []
+        self._collectors: List[Tuple[Optional[str], List[str]]] = []
+        self._open_sections: List[Section] = []
+        self._open_organizations: List[List[Optional[List[str]]]] = []
+        self._pending: List[str] = []
+        self._containers: List[str] = []
+        self._preserve_whitespace_depth = 0
+        self._body_depth = 0
+        self._title_seen = False
+
+    # Text handling
+
+    def _flush(self, is_text: bool = True, is_cdata: bool = False) -> None:
+        if not self._pending:
+            return
+        text = ''.join(self._pending)
+        self._pending = []
+
+        if not self._preserve_whitespace_depth and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+
+        if self._stack and self._stack[-1].children is not None:
+            self._stack[-1].children.append(text)
+
+        if not is_text:
+            return
+        kind = None if is_cdata or not self._containers else self._containers[-1]
+        for collector_kind, parts in self._collectors:
+            if collector_kind == kind:
+                parts.append(text)
+
+    def handle_data(self, data: str) -> None:
+        self._pending.append(data)
+
+    def _handle_special(self, data: str, is_cdata: bool = False) -> None:
+        # Comments, declarations and processing instructions are strings but never text
+        self._flush()
+        self._pending.append(data)
+        self._flush(is_text=is_cdata, is_cdata=is_cdata)
+
+    def handle_comment(self, data: str) -> None:
+        self._handle_special(data)
+
+    def handle_decl(self, decl: str) -> None:
+        self._handle_special(decl[len('DOCTYPE '):])
+
+    def handle_pi(self, data: str) -> None:
+        self._handle_special(data)
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith('CDATA['):
+            self._handle_special(data[len('CDATA['):], is_cdata=True)
+        else:
+            self._handle_special(data)
+
+    # Element handling
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._open(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._close_to(len(self._stack) - 1)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._open(tag, attrs)
+        self._close_to(len(self._stack) - 1)
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush()
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index].tag == tag:
+                self._close_to(index)
+                return
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+        self._close_to(0)
+        self.signals._finish()
+
+    def _collect(self, element: _OpenElement) -> List[str]:
+        if element.parts is None:
+            element.parts = []
+        return element.parts
+
+    def _open(self, tag: str, attr_list: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush()
+        signals = self.signals
+
+        attrs: Dict[str, str] = {}
+        for key, value in attr_list:
+            attrs[key] = '' if value is None else value
+        classes = attrs.get('class', '').split()
+
+        element = _OpenElement(tag, tag if tag in STRING_CONTAINER_ELEMENTS else None)
+
+        if self._stack and self._stack[-1].children is not None:
+            element.children = []
+            self._stack[-1].children.append(element.children)
+
+        # Page-wide signals
+        if tag == 'title' and not self._title_seen:
+            self._title_seen = True
+            element.children = []
+            element.flags |= _TITLE
+        elif tag == 'meta':
+            name = attrs.get('name')
+            if name == 'description' and signals.meta_description is None:
+                signals.meta_description = attrs.get('content', '')
+            elif name == 'keywords' and signals.meta_keywords is None:
+                signals.meta_keywords = attrs.get('content', '')
+        elif tag == 'img':
+            # img[alt*=logo], img[alt*=Logo], img[class*=logo], img[class*=Logo]
+            alt = attrs.get('alt', '')
+            joined_classes = ' '.join(classes)
+            if 'logo' in alt or 'Logo' in alt or 'logo' in joined_classes or 'Logo' in joined_classes:
+                signals.logo_alts.append(alt)
+        elif tag == 'h1':
+            signals._h1_parts.append(self._collect(element))
+        elif tag == 'p':
+            parts = self._collect(element)
+            signals._p_parts.append(parts)
+            if self._body_depth:
+                signals._body_p_parts.append(parts)
+        elif tag == 'a':
+            href = attrs.get('href')
+            if href is not None and any(marker in href for marker in PRODUCT_LINK_MARKERS):
+                signals._product_link_parts.append(self._collect(element))
+
+        if signals._industry_tag_parts is None and not INDUSTRY_TAG_CLASSES.isdisjoint(classes):
+            signals._industry_tag_parts = self._collect(element)
+
+        # Descendants of open sections and organizations
+        if self._open_sections:
+            if tag == 'li':
+                parts = self._collect(element)
+                for section in self._open_sections:
+                    section._li_parts.append(parts)
+            elif tag == 'p':
+                parts = self._collect(element)
+                for section in self._open_sections:
+                    section._p_parts.append(parts)
+            if tag in PRODUCT_HEADING_TAGS or not PRODUCT_HEADING_CLASSES.isdisjoint(classes):
+                parts = self._collect(element)
+                for section in self._open_sections:
+                    section._heading_parts.append(parts)
+
+        if self._open_organizations and attrs.get('itemprop') == 'name':
+            for organization in self._open_organizations:
+                if organization[0] is None:
+                    organization[0] = self._collect(element)
+
+        # This element as a section or organization root
+        matched = list(_SECTIONS_BY_TAG.get(tag, ()))
+        for class_name in classes:
+            matched.extend(_SECTIONS_BY_CLASS.get(class_name, ()))
+        element_id = attrs.get('id')
+        if element_id is not None:
+            matched.extend(_SECTIONS_BY_ID.get(element_id, ()))
+        for selector in matched:
+            if selector not in signals.sections:
+                if element.section is None:
+                    element.section = Section(self._collect(element))
+                signals.sections[selector] = element.section
+
+        if 'schema.org/Organization' in attrs.get('itemtype', ''):
+            # Holds the text buffer of the first [itemprop="name"] descendant
+            element.organization = [None]
+            signals._organizations.append(element.organization)
+
+        # Push
+        if tag in STRING_CONTAINER_ELEMENTS:
+            element.flags |= _STRING_CONTAINER
+            self._containers.append(tag)
+        if tag in PRESERVE_WHITESPACE_ELEMENTS:
+            element.flags |= _PRESERVE_WHITESPACE
+            self._preserve_whitespace_depth += 1
+        if tag == 'body':
+            element.flags |= _BODY
+            self._body_depth += 1
+        if element.parts is not None:
+            self._collectors.append((element.kind, element.parts))
+        if element.section is not None:
+            self._open_sections.append(element.section)
+        if element.organization is not None:
+            self._open_organizations.append(element.organization)
+        self._stack.append(element)
+
+    def _close_to(self, index: int) -> None:
+        """Close every open element from the top of the stack down to index."""
+        while len(self._stack) > index:
+            element = self._stack.pop()
+            if element.flags & _STRING_CONTAINER:
+                self._containers.pop()
+            if element.flags & _PRESERVE_WHITESPACE:
+                self._preserve_whitespace_depth -= 1
+            if element.flags & _BODY:
+                self._body_depth -= 1
+            if element.flags & _TITLE:
+                self.signals.title_string = _single_string(element.children)
+            if element.parts is not None:
+                self._collectors.pop()
+            if element.section is not None:
+                self._open_sections.pop()
+            if element.organization is not None:
+                self._open_organizations.pop()
+
+
+def extract_page_signals(html: str) -> PageSignals:
+    """Parse html once and return every signal the company extractors use."""
+    extractor = PageExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.signals
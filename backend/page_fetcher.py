@@ -0,0 +1,189 @@
+import asyncio
+import codecs
+import logging
+import os
+import random
+import time
+from typing import Optional, Tuple
+
+import httpx
+
+from crawl_scheduler import CrawlScheduler, QueueWaitExceeded
+from metrics import SCRAPE_FETCH_SECONDS
+from page_cache import PAGE_CACHE_ENABLED, PageCache
+
+logger = logging.getLogger(__name__)
+
+# User agents to rotate through to avoid being blocked
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36'
+]
+
+FETCH_TIMEOUT = float(os.getenv('SCRAPER_FETCH_TIMEOUT', '15'))
+MAX_CONNECTIONS = int(os.getenv('SCRAPER_MAX_CONNECTIONS', '100'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('SCRAPER_MAX_KEEPALIVE_CONNECTIONS', '20'))
+# Stop reading a page after this many (decompressed) bytes
+MAX_PAGE_BYTES = int(os.getenv('SCRAPER_MAX_PAGE_BYTES', str(2 * 1024 * 1024)))
+
+# Responses with any other Content-Type are dropped before their body is read
+TEXT_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+
+class PageFetcher:
+    """
+    Async page fetcher on one pooled HTTP client.
+
+    Connections are kept alive and reused across pages and domains, HTTP/2 is
+    negotiated where the server supports it, and gzip/brotli bodies are
+    decoded transparently. Every request waits for its turn from a
+    CrawlScheduler, which enforces per-host and global rate limits. A page
+    whose turn would take longer than the scheduler's max wait is skipped,
+    or served from the cache if there's a stored copy.
+
+    Bodies are streamed: responses that aren't HTML or text are rejected from
+    their headers alone, and reading stops after max_page_bytes, so a large
+    bundle or PDF never sits in memory.
+
+    With a PageCache, recently fetched pages are served from disk without a
+    request, older ones are revalidated with If-None-Match/If-Modified-Since
+    so unchanged pages cost a 304, and stored pages stand in when a site
+    can't be reached. Cache reads and writes run in the default executor so
+    disk I/O never blocks the event loop, and truncated pages aren't stored.
+
+    A custom httpx transport can be passed in, e.g. to serve pages from a
+    local corpus in benchmarks.
+    """
+
+    def __init__(self, timeout: float = FETCH_TIMEOUT, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                 scheduler: Optional[CrawlScheduler] = None, cache: Optional[PageCache] = None,
+                 max_page_bytes: int = MAX_PAGE_BYTES, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_page_bytes = max_page_bytes
+        self.scheduler = scheduler or CrawlScheduler()
+        self.cache = cache
+        self._client = httpx.AsyncClient(
+            http2=True,
+            transport=transport,
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            headers={
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Upgrade-Insecure-Requests': '1',
+            }
+        )
+
+    async def fetch(self, url: str) -> str:
+        """Fetch a page and return its text, or "" on any error or non-200 status."""
+        started = time.monotonic()
+        text, outcome = await self._fetch(url)
+        SCRAPE_FETCH_SECONDS.labels(outcome).observe(time.monotonic() - started)
+        return text
+
+    async def _fetch(self, url: str) -> Tuple[str, str]:
+        """Fetch a page; returns (text, outcome) where outcome says how it was served."""
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.cache.get, url) if self.cache else None
+        if cached and self.cache.is_fresh(cached):
+            self.cache.hits += 1
+            return cached.body, "cache_fresh"
+
+        headers = {'User-Agent': random.choice(USER_AGENTS)}
+        if cached:
+            headers.update(cached.conditional_headers())
+
+        try:
+            async with self.scheduler.slot(url):
+                async with self._client.stream('GET', url, headers=headers) as response:
+                    if response.status_code == 304 and cached:
+                        self.cache.revalidated += 1
+                        await loop.run_in_executor(
+                            None, self.cache.touch, cached,
+                            response.headers.get('ETag'), response.headers.get('Last-Modified')
+                        )
+                        return cached.body, "not_modified"
+                    if response.status_code != 200:
+                        logger.warning(f"Failed to fetch {url}: Status code {response.status_code}")
+                        return "", "http_error"
+
+                    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    if content_type and content_type not in TEXT_CONTENT_TYPES:
+                        logger.warning(f"Skipping {url}: Content-Type {content_type}")
+                        return "", "rejected"
+
+                    text, truncated = await self._read_text(response)
+
+            if self.cache:
+                self.cache.misses += 1
+                # A cut-off page would later be served as if it were the whole thing
+                if not truncated:
+                    await loop.run_in_executor(
+                        None, self.cache.put, url, text,
+                        response.headers.get('ETag'), response.headers.get('Last-Modified')
+                    )
+            return text, "fetched"
+        except QueueWaitExceeded as e:
+            if cached:
+                logger.warning(f"Skipping request to {url}, serving cached copy: {str(e)}")
+                self.cache.offline_hits += 1
+                return cached.body, "queue_timeout_cache"
+            logger.warning(f"Skipping {url}: {str(e)}")
+            return "", "queue_timeout"
+        except Exception as e:
+            if cached:
+                # Site unreachable: fall back to the copy we already have
+                logger.warning(f"Error during request to {url}, serving cached copy: {str(e)}")
+                self.cache.offline_hits += 1
+                return cached.body, "offline_cache"
+            logger.warning(f"Error during request to {url}: {str(e)}")
+            return "", "error"
+
+    async def _read_text(self, response: httpx.Response) -> Tuple[str, bool]:
+        """Decode a streamed body chunk by chunk, stopping at max_page_bytes; returns (text, truncated)."""
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        parts = []
+        truncated = False
+        remaining = self.max_page_bytes
+        async for chunk in response.aiter_bytes():
+            if len(chunk) > remaining:
+                parts.append(decoder.decode(chunk[:remaining]))
+                logger.info(f"Truncated {response.url} at {self.max_page_bytes} bytes")
+                truncated = True
+                break
+            remaining -= len(chunk)
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts), truncated
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_fetcher: Optional[PageFetcher] = None
+
+def get_fetcher() -> PageFetcher:
+    """Return the process-wide fetcher, creating it on first use."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = PageFetcher(cache=PageCache() if PAGE_CACHE_ENABLED else None)
+    return _fetcher
+
+async def close_fetcher() -> None:
+    """Close the shared fetcher and its connection pool."""
+    global _fetcher
+    if _fetcher is not None:
+        await _fetcher.close()
+        _fetcher = None
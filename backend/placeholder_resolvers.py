@@ -0,0 +1,125 @@
+import datetime
+import os
+from typing import Callable, Dict, List, Optional
+
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from ai_prompts import analysis_cache
+from domains import normalize_domain
+
+# Time zone that suggested meeting slots are given in
+MEETING_TIMEZONE = os.getenv('MEETING_TIMEZONE', 'America/New_York')
+# Hour of day (24h) for each suggested slot, one slot per business day
+MEETING_HOURS = [int(hour) for hour in os.getenv('MEETING_HOURS', '10,15,13').split(',') if hour.strip()]
+# Dates (YYYY-MM-DD) that are never suggested, e.g. public holidays
+MEETING_HOLIDAYS = {
+    datetime.date.fromisoformat(day.strip())
+    for day in os.getenv('MEETING_HOLIDAYS', '').split(',') if day.strip()
+}
+
+# Short names for time zones people usually write without daylight saving
+TIMEZONE_LABELS = {
+    'America/New_York': 'ET',
+    'America/Chicago': 'CT',
+    'America/Denver': 'MT',
+    'America/Los_Angeles': 'PT',
+}
+
+Resolver = Callable[[str, str], Optional[str]]
+
+
+class PlaceholderResolvers:
+    """
+    Registry of local resolvers tried before asking the AI for a placeholder.
+
+    A resolver gets (placeholder, recipient_email) and returns the value, or
+    None when it can't answer, in which case the next resolver registered
+    for that placeholder is tried and finally the AI.
+    """
+
+    def __init__(self):
+        self._resolvers: Dict[str, List[Resolver]] = {}
+
+    def register(self, *placeholders: str) -> Callable[[Resolver], Resolver]:
+        def decorator(resolver: Resolver) -> Resolver:
+            for placeholder in placeholders:
+                self._resolvers.setdefault(placeholder, []).append(resolver)
+            return resolver
+        return decorator
+
+    def resolve(self, placeholder: str, recipient_email: str) -> Optional[str]:
+        for resolver in self._resolvers.get(placeholder, []):
+            try:
+                value = resolver(placeholder, recipient_email)
+            except Exception as e:
+                print(f"Resolver {resolver.__name__} failed for {placeholder}: {str(e)}")
+                continue
+            if value:
+                return value
+        return None
+
+
+resolvers = PlaceholderResolvers()
+
+
+def _meeting_timezone() -> datetime.tzinfo:
+    try:
+        return ZoneInfo(MEETING_TIMEZONE)
+    except ZoneInfoNotFoundError:
+        print(f"Unknown time zone {MEETING_TIMEZONE}, suggesting meeting slots in UTC")
+        return datetime.timezone.utc
+
+
+def _format_hour(hour: int) -> str:
+    suffix = 'AM' if hour < 12 else 'PM'
+    return f"{hour % 12 or 12} {suffix}"
+
+
+def meeting_slots(now: Optional[datetime.datetime] = None, hours: Optional[List[int]] = None) -> str:
+    """
+    Suggest one meeting slot per business day next week.
+
+    Monday is skipped, as the usual suggestions start on Tuesday, and so are
+    weekends and MEETING_HOLIDAYS; if next week runs out of days the slots
+    continue into the week after. Formatted like
+    'Tuesday at 10 AM ET, Wednesday at 3 PM ET, Thursday at 1 PM ET'.
+    """
+    tz = _meeting_timezone()
+    hours = hours or MEETING_HOURS
+    now = now.astimezone(tz) if now else datetime.datetime.now(tz)
+    day = now.date() + datetime.timedelta(days=8 - now.isoweekday())
+
+    slots = []
+    while len(slots) < len(hours):
+        if day.weekday() not in (0, 5, 6) and day not in MEETING_HOLIDAYS:
+            hour = hours[len(slots)]
+            start = datetime.datetime(day.year, day.month, day.day, hour, tzinfo=tz)
+            label = TIMEZONE_LABELS.get(MEETING_TIMEZONE) or start.tzname()
+            slots.append(f"{start:%A} at {_format_hour(hour)} {label}")
+        day += datetime.timedelta(days=1)
+    return ', '.join(slots)
+
+
+@resolvers.register("specific dates/times")
+def resolve_meeting_slots(placeholder: str, recipient_email: str) -> Optional[str]:
+    return meeting_slots()
+
+
+# Placeholder -> field of a cached analysis that answers it
+ANALYSIS_FIELDS = {
+    "Industry": "industry",
+    "industry": "industry",
+    "specific achievement or aspect of their business": "business_focus",
+}
+
+
+@resolvers.register(*ANALYSIS_FIELDS)
+def resolve_from_analysis(placeholder: str, recipient_email: str) -> Optional[str]:
+    """Answer from the domain's cached company analysis, if there is one."""
+    if '@' not in recipient_email:
+        return None
+    record = analysis_cache.peek(normalize_domain(recipient_email))
+    if not record or not record.get("success"):
+        return None
+    value = (record.get("searchData") or {}).get(ANALYSIS_FIELDS[placeholder])
+    return value.strip() if isinstance(value, str) and value.strip() else None
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to an estimate
+    tiktoken = None
+
+# Most tokens of each kind of input sent to the model; longer inputs are cut
+SEARCH_RESULTS_TOKEN_BUDGET = int(os.getenv('SEARCH_RESULTS_TOKEN_BUDGET', '3000'))
+DESCRIPTION_TOKEN_BUDGET = int(os.getenv('DESCRIPTION_TOKEN_BUDGET', '800'))
+EMAIL_BODY_TOKEN_BUDGET = int(os.getenv('EMAIL_BODY_TOKEN_BUDGET', '1500'))
+# Hard ceiling on tokens (sent + received) spent on one domain within the window; 0 disables it
+DOMAIN_TOKEN_CEILING = int(os.getenv('DOMAIN_TOKEN_CEILING', '0'))
+DOMAIN_TOKEN_WINDOW = float(os.getenv('DOMAIN_TOKEN_WINDOW', str(24 * 3600)))
+
+TOKENIZER_ENCODING = 'o200k_base'
+TRUNCATION_MARKER = '\n…(truncated)'
+
+# Characters per token assumed when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised instead of calling the model once a domain has used up its token ceiling."""
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def load_tokenizer() -> bool:
+    """
+    Load the tokenizer; returns whether it is available.
+
+    Loading may download the encoding, so it blocks: the API runs it in an
+    executor at startup. Until it has loaded, or if it can't be, token
+    counts are estimated from the length of the text.
+    """
+    global _encoding, tiktoken
+    with _encoding_lock:
+        if _encoding is None and tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                # e.g. the encoding can't be downloaded; don't try again
+                print(f"Tokenizer unavailable, estimating token counts: {str(e)}")
+                tiktoken = None
+        return _encoding is not None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in text, estimating when the tokenizer isn't loaded."""
+    encoding = _encoding
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def trim_to_budget(text: str, budget: int) -> str:
+    """
+    Cut text to at most budget tokens, keeping the beginning.
+
+    The cut moves back to the last paragraph, line or sentence break in
+    the final fifth of the kept text so the input doesn't end mid-sentence,
+    and a marker is added. The same text and budget always give the same
+    result.
+    """
+    if count_tokens(text) <= budget:
+        return text
+
+    budget = max(0, budget - count_tokens(TRUNCATION_MARKER))
+    encoding = _encoding
+    if encoding is not None:
+        kept = encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    else:
+        kept = text[:budget * CHARS_PER_TOKEN]
+
+    floor = len(kept) * 4 // 5
+    for separator in ('\n\n', '\n', '. '):
+        cut = kept.rfind(separator, floor)
+        if cut != -1:
+            kept = kept[:cut + (1 if separator == '. ' else 0)]
+            break
+    return kept.rstrip() + TRUNCATION_MARKER
+
+
+class TokenLedger:
+    """
+    Record of the tokens sent and received by every model call in this process.
+
+    Totals are kept per call name; calls made for a domain are also kept in a
+    sliding window so DOMAIN_TOKEN_CEILING can be enforced before the next
+    call is made.
+    """
+
+    def __init__(self, ceiling: int = DOMAIN_TOKEN_CEILING, window: float = DOMAIN_TOKEN_WINDOW):
+        self.ceiling = ceiling
+        self.window = window
+        self.calls: Dict[str, Dict[str, int]] = {}
+        self.rejected = 0
+        self._domains: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _domain_usage(self, domain: str, now: float) -> int:
+        entries = self._domains.get(domain)
+        if not entries:
+            return 0
+        while entries and entries[0][0] < now - self.window:
+            entries.popleft()
+        return sum(tokens for _, tokens in entries)
+
+    def domain_usage(self, domain: str) -> int:
+        with self._lock:
+            return self._domain_usage(domain, time.time())
+
+    def check(self, domain: Optional[str], estimated_tokens: int = 0) -> None:
+        """Raise TokenBudgetExceeded if a call of about estimated_tokens would pass the domain's ceiling."""
+        if not domain or not self.ceiling:
+            return
+        with self._lock:
+            used = self._domain_usage(domain, time.time())
+            if used + estimated_tokens > self.ceiling:
+                self.rejected += 1
+                raise TokenBudgetExceeded(
+                    f"Token ceiling reached for {domain}: {used} used, {estimated_tokens} more requested, "
+                    f"ceiling {self.ceiling}"
+                )
+
+    def record(self, call: str, domain: Optional[str], sent: int, received: int) -> None:
+        with self._lock:
+            totals = self.calls.setdefault(call, {"calls": 0, "sent": 0, "received": 0})
+            totals["calls"] += 1
+            totals["sent"] += sent
+            totals["received"] += received
+            if domain:
+                self._domains.setdefault(domain, deque()).append((time.time(), sent + received))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                "calls": {call: dict(totals) for call, totals in self.calls.items()},
+                "domains_tracked": sum(1 for domain in self._domains if self._domain_usage(domain, now)),
+                "rejected": self.rejected,
+                "domain_ceiling": self.ceiling,
+                "tokenizer": TOKENIZER_ENCODING if _encoding is not None else "estimate"
+            }
+
+
+ledger = TokenLedger()
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and share its result (or exception).
+    Once the task finishes the key is forgotten, so later calls start fresh.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Return the in-flight task for key, starting fn() if there is none."""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+        self.started += 1
+
+        def forget(finished: asyncio.Future) -> None:
+            if self._tasks.get(key) is finished:
+                del self._tasks[key]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the call already in flight."""
+        # Shield so one caller giving up doesn't cancel the work for the others
+        return await asyncio.shield(self.start(key, fn))
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._tasks
@@ -1,26 +1,101 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import re
 import logging
-import time
-from typing import Dict, List, Any
-import random
-from urllib.parse import urljoin
+from typing import Dict, List, Any, Tuple
+from analysis_cache import AnalysisCache, FRESH, STALE
+from domains import normalize_domain
+from keyword_matcher import KeywordMatcher
+from page_extractor import (
+    ABOUT_SECTION_SELECTORS,
+    ACHIEVEMENT_SECTION_SELECTORS,
+    INDUSTRY_SECTION_SELECTORS,
+    PRODUCT_SECTION_SELECTORS,
+    PageSignals,
+    extract_page_signals,
+)
+from page_fetcher import get_fetcher
+from single_flight import SingleFlight
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# User agents to rotate through to avoid being blocked
-USER_AGENTS = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36'
+# Scraped company info, keyed on normalized domain
+company_info_cache = AnalysisCache("company_info")
+# Concurrent scrapes of the same domain share one in-flight run
+scrape_flights = SingleFlight()
+
+# Common industries (expanded list)
+INDUSTRIES = [
+    "Cosmetics", "Beauty", "Makeup", "Skincare", "Personal Care",
+    "Technology", "Software", "IT Services", "SaaS", "Cloud Computing", 
+    "Healthcare", "Medical", "Pharmaceuticals", "Biotech", "Life Sciences",
+    "Finance", "Banking", "Insurance", "Investment", "Wealth Management",
+    "Education", "EdTech", "E-learning", "Academic", "Training",
+    "Manufacturing", "Production", "Industrial", "Engineering", "Construction",
+    "Retail", "E-commerce", "Consumer Goods", "Shopping", "Merchandising",
+    "Consulting", "Professional Services", "Business Services", "Advisory",
+    "Marketing", "Advertising", "Digital Marketing", "PR", "Communications",
+    "Real Estate", "Property", "Housing", "Architecture", "Interior Design",
+    "Energy", "Utilities", "Renewable Energy", "Oil & Gas", "Electricity",
+    "Automotive", "Transportation", "Mobility", "Vehicles", "Auto Parts",
+    "Agriculture", "Farming", "Food Production", "Agritech", "Cultivation",
+    "Telecommunications", "Telecom", "Networking", "Internet Services", "Mobile",
+    "Media", "Publishing", "Broadcasting", "News", "Digital Media",
+    "Entertainment", "Gaming", "Film", "Music", "Arts",
+    "Travel", "Tourism", "Hospitality", "Hotels", "Vacation",
+    "Food & Beverage", "Restaurants", "Catering", "Food Service", "Culinary",
+    "Fashion", "Apparel", "Clothing", "Textiles", "Accessories"
 ]
 
-def get_company_info(domain: str) -> Dict[str, Any]:
+# General categories to fall back on when no specific industry is named
+BROADER_CATEGORIES = {
+    "Beauty & Cosmetics": ["beauty", "makeup", "cosmetic", "skin", "hair", "personal care", "salon"],
+    "Technology": ["tech", "software", "digital", "online", "platform", "app", "web"],
+    "Healthcare": ["health", "medical", "wellness", "therapy", "clinic", "doctor", "patient"],
+    "Finance": ["finance", "banking", "money", "investment", "financial", "bank", "loan"],
+    "Retail": ["shop", "store", "retail", "buy", "purchase", "product", "consumer"],
+    "Education": ["education", "school", "learn", "student", "teach", "training", "course"]
+}
+
+# Achievement-related words
+ACHIEVEMENT_WORDS = [
+    'award', 'recognition', 'honor', 'prize', 'achievement', 
+    'success', 'milestone', 'leader', 'innovation', 'breakthrough',
+    'patent', 'launch', 'expand', 'growth', 'increase', 'improve',
+    'first', 'best', 'top', 'leading', 'premier', 'excellence',
+    'recognized', 'renowned', 'celebrated', 'distinguished',
+    'trusted', 'certified', 'approved', 'endorsed', 'featured'
+]
+
+# Common title patterns to remove
+TITLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'\s+[-|]\s+.*$',         # Remove "- Home" or "| Official Website"
+    r'\s*[\(\[\{].*?[\)\]\}]', # Remove parentheses content
+    r'Home\s*[-|]?\s*',        # Remove "Home -" or "Home |"
+    r'Welcome\s*[-|]?\s*',     # Remove "Welcome to" 
+    r'Official\s*[-|]?\s*',    # Remove "Official" 
+    r'Website\s*[-|]?\s*'      # Remove "Website"
+]]
+
+# Purpose/mission statements in a description
+PURPOSE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'(?:we|our company|our mission is to) (provide|offer|deliver|create|build|help|enable|empower|transform)[\w\s,]+',
+    r'(?:dedicated|committed) to [\w\s,]+',
+    r'(?:specializ|focuse|concentrate)(?:e|ed|es|ing) (?:in|on) [\w\s,]+'
+]]
+
+# Keyword lists compiled once; list order is match priority
+INDUSTRY_MATCHER = KeywordMatcher(INDUSTRIES)
+_CATEGORY_KEYWORDS = [(category, keyword) for category, keywords in BROADER_CATEGORIES.items() for keyword in keywords]
+CATEGORY_MATCHER = KeywordMatcher([keyword for _, keyword in _CATEGORY_KEYWORDS])
+ACHIEVEMENT_MATCHER = KeywordMatcher(ACHIEVEMENT_WORDS)
+
+async def get_company_info(domain: str) -> Dict[str, Any]:
     """
-    Scrape company information from a given domain.
+    Get company information for a domain, serving cached results when available.
+    
+    Fresh cache entries are returned directly. In stale-while-revalidate mode
+    an expired entry is returned right away and re-scraped in the background.
     
     Args:
         domain: The domain to scrape (e.g., 'sugarcosmetics.com')
@@ -28,6 +103,33 @@ def get_company_info(domain: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing company info
     """
+    key = normalize_domain(domain)
+    cached, state = company_info_cache.lookup(key)
+    
+    if state == FRESH:
+        return cached
+    
+    if state == STALE:
+        if not scrape_flights.in_flight(key):
+            company_info_cache.refreshes += 1
+            scrape_flights.start(key, lambda: _scrape_and_store(key))
+        return cached
+    
+    return await scrape_flights.do(key, lambda: _scrape_and_store(key))
+
+async def _scrape_and_store(key: str) -> Dict[str, Any]:
+    result, pages_fetched = await scrape_company_info(key)
+    if pages_fetched:
+        company_info_cache.set(key, result)
+    return result
+
+async def scrape_company_info(domain: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Scrape company information from a given domain, bypassing the cache.
+    
+    Returns:
+        The company info dictionary and the number of pages successfully fetched
+    """
     result = {
         "company_name": "",
         "industry": "",
@@ -39,6 +141,7 @@ def get_company_info(domain: str) -> Dict[str, Any]:
     
     # Ensure domain doesn't have http/https
     clean_domain = domain.replace("http://", "").replace("https://", "").split('/')[0]
+    pages_fetched = 0
     
     try:
         # Try to fetch and analyze multiple pages for better insights
@@ -50,43 +153,41 @@ def get_company_info(domain: str) -> Dict[str, Any]:
             f"https://www.linkedin.com/company/{clean_domain.split('.')[0]}"  # LinkedIn
         ]
         
-        all_text = ""
+        # Fetch every candidate page concurrently, then process them in order
+        # so earlier pages still take priority for single-valued fields
+        page_contents = await asyncio.gather(*(fetch_page(url) for url in pages_to_check))
         
-        for url in pages_to_check:
+        for url, page_content in zip(pages_to_check, page_contents):
             try:
-                page_content = fetch_page(url)
                 if page_content:
-                    all_text += " " + page_content
+                    pages_fetched += 1
                     
-                    # Process this page
-                    soup = BeautifulSoup(page_content, 'html.parser')
+                    # Collect everything the extractors need in one pass over the page
+                    page = extract_page_signals(page_content)
                     
                     # Try to extract company name if not already found
                     if not result["company_name"]:
-                        result["company_name"] = extract_company_name(soup, clean_domain)
+                        result["company_name"] = extract_company_name(page, clean_domain)
                     
                     # Try to find industry information
                     if not result["industry"]:
-                        result["industry"] = extract_industry(soup)
+                        result["industry"] = extract_industry(page)
                     
                     # Gather achievements
-                    achievements = extract_achievements(soup)
+                    achievements = extract_achievements(page)
                     if achievements:
                         result["achievements"].extend(achievements)
                     
                     # Extract description if not already found
                     if not result["description"]:
-                        result["description"] = extract_description(soup)
+                        result["description"] = extract_description(page)
                     
                     # Find products
-                    products = extract_products(soup)
+                    products = extract_products(page)
                     if products:
                         result["products"].extend(products)
-                
-                # Brief pause between requests
-                time.sleep(random.uniform(0.5, 1.5))
             except Exception as e:
-                logger.warning(f"Error fetching {url}: {str(e)}")
+                logger.warning(f"Error processing {url}: {str(e)}")
                 continue
         
         # Deduplicate achievements and products
@@ -98,8 +199,7 @@ def get_company_info(domain: str) -> Dict[str, Any]:
             result["description"], 
             result["achievements"], 
             result["products"],
-            result["industry"],
-            all_text
+            result["industry"]
         )
         
     except Exception as e:
@@ -115,191 +215,97 @@ def get_company_info(domain: str) -> Dict[str, Any]:
     if not result["business_focus"]:
         result["business_focus"] = f"providing innovative solutions in the {result['industry']} sector"
     
-    return result
+    return result, pages_fetched
 
-def fetch_page(url: str) -> str:
-    """Fetch a web page with error handling and rotating user agents."""
-    try:
-        headers = {
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            return response.text
-        else:
-            logger.warning(f"Failed to fetch {url}: Status code {response.status_code}")
-            return ""
-    except Exception as e:
-        logger.warning(f"Error during request to {url}: {str(e)}")
-        return ""
+async def fetch_page(url: str) -> str:
+    """Fetch a web page through the shared pooled fetcher with rotating user agents."""
+    return await get_fetcher().fetch(url)
 
-def extract_company_name(soup: BeautifulSoup, domain: str) -> str:
+def extract_company_name(page: PageSignals, domain: str) -> str:
     """Extract company name from various common locations in a webpage."""
     # Try logo alt text
-    logos = soup.select('img[alt*=logo], img[alt*=Logo], img[class*=logo], img[class*=Logo]')
-    for logo in logos:
-        alt = logo.get('alt', '')
+    for alt in page.logo_alts:
         if alt and len(alt) > 2 and 'logo' not in alt.lower():
             return alt.strip()
     
     # Try page title
-    if soup.title:
-        title = soup.title.string
-        if title:
-            # Common patterns to remove
-            patterns = [
-                r'\s+[-|]\s+.*$',         # Remove "- Home" or "| Official Website"
-                r'\s*[\(\[\{].*?[\)\]\}]', # Remove parentheses content
-                r'Home\s*[-|]?\s*',        # Remove "Home -" or "Home |"
-                r'Welcome\s*[-|]?\s*',     # Remove "Welcome to" 
-                r'Official\s*[-|]?\s*',    # Remove "Official" 
-                r'Website\s*[-|]?\s*'      # Remove "Website"
-            ]
-            clean_title = title.strip()
-            for pattern in patterns:
-                clean_title = re.sub(pattern, '', clean_title, flags=re.IGNORECASE)
-            
-            if clean_title and len(clean_title) > 2:
-                return clean_title.strip()
+    title = page.title_string
+    if title:
+        clean_title = title.strip()
+        for pattern in TITLE_PATTERNS:
+            clean_title = pattern.sub('', clean_title)
+        
+        if clean_title and len(clean_title) > 2:
+            return clean_title.strip()
     
     # Try h1 tags
-    h1s = soup.select('h1')
-    for h1 in h1s:
-        text = h1.get_text().strip()
+    for text in page.h1_texts:
+        text = text.strip()
         if text and len(text) < 50:  # Avoid long headlines
             return text
     
     # Try schema.org structured data
-    org_schemas = soup.select('[itemtype*="schema.org/Organization"]')
-    for org in org_schemas:
-        name = org.select_one('[itemprop="name"]')
-        if name:
-            return name.get_text().strip()
+    for name in page.organization_names:
+        return name.strip()
     
     # Fallback to domain-based name
     return domain.split('.')[0].title()
 
-def extract_industry(soup: BeautifulSoup) -> str:
+def extract_industry(page: PageSignals) -> str:
     """Try to extract industry information."""
     # Look for common industry indicators in meta tags
-    meta_desc = soup.find('meta', attrs={'name': 'description'})
-    meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-    
     text_to_check = ""
-    if meta_desc and meta_desc.get('content'):
-        text_to_check += meta_desc.get('content', '') + " "
-    if meta_keywords and meta_keywords.get('content'):
-        text_to_check += meta_keywords.get('content', '') + " "
+    if page.meta_description:
+        text_to_check += page.meta_description + " "
+    if page.meta_keywords:
+        text_to_check += page.meta_keywords + " "
     
     # Add text from main sections
-    for selector in ['main', '.main', '#main', '.content', '#content', 'article', '.about', '#about']:
-        section = soup.select_one(selector)
+    for selector in INDUSTRY_SECTION_SELECTORS:
+        section = page.sections.get(selector)
         if section:
-            text_to_check += section.get_text() + " "
+            text_to_check += section.text + " "
     
     # Try to find LinkedIn industry section
-    industry_section = soup.select_one('.org-top-card-summary__info-item, .industry-tag')
-    if industry_section:
-        industry_text = industry_section.get_text().strip()
+    if page.industry_tag_text is not None:
+        industry_text = page.industry_tag_text.strip()
         if industry_text and len(industry_text) < 50:
             return industry_text
     
-    # Common industries (expanded list)
-    industries = [
-        "Cosmetics", "Beauty", "Makeup", "Skincare", "Personal Care",
-        "Technology", "Software", "IT Services", "SaaS", "Cloud Computing", 
-        "Healthcare", "Medical", "Pharmaceuticals", "Biotech", "Life Sciences",
-        "Finance", "Banking", "Insurance", "Investment", "Wealth Management",
-        "Education", "EdTech", "E-learning", "Academic", "Training",
-        "Manufacturing", "Production", "Industrial", "Engineering", "Construction",
-        "Retail", "E-commerce", "Consumer Goods", "Shopping", "Merchandising",
-        "Consulting", "Professional Services", "Business Services", "Advisory",
-        "Marketing", "Advertising", "Digital Marketing", "PR", "Communications",
-        "Real Estate", "Property", "Housing", "Architecture", "Interior Design",
-        "Energy", "Utilities", "Renewable Energy", "Oil & Gas", "Electricity",
-        "Automotive", "Transportation", "Mobility", "Vehicles", "Auto Parts",
-        "Agriculture", "Farming", "Food Production", "Agritech", "Cultivation",
-        "Telecommunications", "Telecom", "Networking", "Internet Services", "Mobile",
-        "Media", "Publishing", "Broadcasting", "News", "Digital Media",
-        "Entertainment", "Gaming", "Film", "Music", "Arts",
-        "Travel", "Tourism", "Hospitality", "Hotels", "Vacation",
-        "Food & Beverage", "Restaurants", "Catering", "Food Service", "Culinary",
-        "Fashion", "Apparel", "Clothing", "Textiles", "Accessories"
-    ]
-    
     # Check for industry mentions
-    for industry in industries:
-        pattern = r'\b' + re.escape(industry) + r'\b'
-        if re.search(pattern, text_to_check, re.IGNORECASE):
-            return industry
+    industry = INDUSTRY_MATCHER.first_match(text_to_check)
+    if industry:
+        return industry
     
     # If no specific industry found, check for general categories
-    broader_categories = {
-        "Beauty & Cosmetics": ["beauty", "makeup", "cosmetic", "skin", "hair", "personal care", "salon"],
-        "Technology": ["tech", "software", "digital", "online", "platform", "app", "web"],
-        "Healthcare": ["health", "medical", "wellness", "therapy", "clinic", "doctor", "patient"],
-        "Finance": ["finance", "banking", "money", "investment", "financial", "bank", "loan"],
-        "Retail": ["shop", "store", "retail", "buy", "purchase", "product", "consumer"],
-        "Education": ["education", "school", "learn", "student", "teach", "training", "course"]
-    }
-    
-    for category, keywords in broader_categories.items():
-        for keyword in keywords:
-            if re.search(r'\b' + re.escape(keyword) + r'\b', text_to_check, re.IGNORECASE):
-                return category
+    index = CATEGORY_MATCHER.first_match_index(text_to_check)
+    if index is not None:
+        return _CATEGORY_KEYWORDS[index][0]
     
     return "Technology"  # Default fallback
 
-def extract_achievements(soup: BeautifulSoup) -> List[str]:
+def extract_achievements(page: PageSignals) -> List[str]:
     """Extract possible achievements or notable aspects of the business."""
     achievements = []
     
-    # Look in sections that might contain achievements
-    achievement_sections = [
-        '.achievements', '#achievements', '.awards', '#awards',
-        '.milestones', '#milestones', '.about-us', '#about-us',
-        '.highlights', '#highlights', '.features', '#features',
-        '.timeline', '#timeline', '.history', '#history'
-    ]
-    
-    # Achievement-related words
-    achievement_words = [
-        'award', 'recognition', 'honor', 'prize', 'achievement', 
-        'success', 'milestone', 'leader', 'innovation', 'breakthrough',
-        'patent', 'launch', 'expand', 'growth', 'increase', 'improve',
-        'first', 'best', 'top', 'leading', 'premier', 'excellence',
-        'recognized', 'renowned', 'celebrated', 'distinguished',
-        'trusted', 'certified', 'approved', 'endorsed', 'featured'
-    ]
-    
     # Check for achievement-like content in these sections
-    for selector in achievement_sections:
-        section = soup.select_one(selector)
+    for selector in ACHIEVEMENT_SECTION_SELECTORS:
+        section = page.sections.get(selector)
         if section:
             # Look for list items
-            items = section.select('li')
+            items = section.li_texts
             if items:
                 for item in items:
-                    text = item.get_text().strip()
+                    text = item.strip()
                     if text and len(text) > 15 and len(text) < 200:
                         achievements.append(text)
     
     # Look for paragraphs with achievement words
-    paragraphs = soup.select('p')
-    for p in paragraphs:
-        text = p.get_text().strip()
+    for p in page.paragraph_texts:
+        text = p.strip()
         if text and 20 < len(text) < 200:  # Reasonable length
-            for word in achievement_words:
-                if re.search(r'\b' + re.escape(word) + r'\b', text, re.IGNORECASE):
-                    achievements.append(text)
-                    break
+            if ACHIEVEMENT_MATCHER.contains_any(text):
+                achievements.append(text)
     
     # Clean and limit achievements
     clean_achievements = []
@@ -327,70 +333,57 @@ def extract_achievements(soup: BeautifulSoup) -> List[str]:
     
     return clean_achievements
 
-def extract_description(soup: BeautifulSoup) -> str:
+def extract_description(page: PageSignals) -> str:
     """Extract a general company description."""
     # Try meta description first
-    meta_desc = soup.find('meta', attrs={'name': 'description'})
-    if meta_desc and meta_desc.get('content'):
-        desc = meta_desc.get('content').strip()
+    if page.meta_description:
+        desc = page.meta_description.strip()
         if len(desc) > 50:
             return desc
     
     # Try to find an about section
-    about_selectors = [
-        '.about', '#about', '.about-us', '#about-us', 
-        '.company', '#company', '.description', '#description',
-        '.mission', '#mission', '.vision', '#vision'
-    ]
-    
-    for selector in about_selectors:
-        section = soup.select_one(selector)
+    for selector in ABOUT_SECTION_SELECTORS:
+        section = page.sections.get(selector)
         if section:
-            paras = section.select('p')
+            paras = section.p_texts
             if paras:
                 # Combine paragraphs
-                description = ' '.join([p.get_text().strip() for p in paras[:2]])
+                description = ' '.join([p.strip() for p in paras[:2]])
                 description = re.sub(r'\s+', ' ', description).strip()
                 if len(description) > 50:
                     return description
     
     # Try first substantial paragraphs in the body
-    for p in soup.select('body p'):
-        text = p.get_text().strip()
+    for p in page.body_paragraph_texts:
+        text = p.strip()
         if len(text) > 50 and len(text) < 300:
             return text
     
     return ""
 
-def extract_products(soup: BeautifulSoup) -> List[str]:
+def extract_products(page: PageSignals) -> List[str]:
     """Extract products or services offered by the company."""
     products = []
     
     # Look for product sections
-    product_selectors = [
-        '.products', '#products', '.services', '#services',
-        '.offerings', '#offerings', '.solutions', '#solutions',
-        '.shop', '#shop', '.catalog', '#catalog'
-    ]
-    
-    for selector in product_selectors:
-        section = soup.select_one(selector)
+    for selector in PRODUCT_SECTION_SELECTORS:
+        section = page.sections.get(selector)
         if section:
             # Look for product names in headings
-            for h in section.select('h2, h3, h4, .product-title, .product-name'):
-                text = h.get_text().strip()
+            for h in section.heading_texts:
+                text = h.strip()
                 if text and 3 < len(text) < 50:
                     products.append(text)
             
             # Look for product names in list items
-            for li in section.select('li'):
-                text = li.get_text().strip()
+            for li in section.li_texts:
+                text = li.strip()
                 if text and 3 < len(text) < 50:
                     products.append(text)
     
     # Look for product categories
-    for a in soup.select('a[href*=product], a[href*=shop], a[href*=category]'):
-        text = a.get_text().strip()
+    for a in page.product_link_texts:
+        text = a.strip()
         if text and 3 < len(text) < 50 and not any(x in text.lower() for x in ['home', 'about', 'contact', 'more']):
             products.append(text)
     
@@ -415,19 +408,13 @@ def extract_products(soup: BeautifulSoup) -> List[str]:
     
     return clean_products
 
-def generate_business_focus(description: str, achievements: List[str], products: List[str], industry: str, all_text: str) -> str:
+def generate_business_focus(description: str, achievements: List[str], products: List[str], industry: str) -> str:
     """Generate a concise business focus statement based on available information."""
     # If we have a good description, use it as a base
     if description and len(description) > 100:
         # Find purpose/mission statements
-        purpose_patterns = [
-            r'(?:we|our company|our mission is to) (provide|offer|deliver|create|build|help|enable|empower|transform)[\w\s,]+',
-            r'(?:dedicated|committed) to [\w\s,]+',
-            r'(?:specializ|focuse|concentrate)(?:e|ed|es|ing) (?:in|on) [\w\s,]+'
-        ]
-        
-        for pattern in purpose_patterns:
-            match = re.search(pattern, description, re.IGNORECASE)
+        for pattern in PURPOSE_PATTERNS:
+            match = pattern.search(description)
             if match:
                 # Extract and clean up the matched text
                 focus = match.group(0)
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import templates, { EmailTemplate } from '../data/templates';
-import { createDraft, scrapeWebsite } from '../utils/api';
+import { batchAnalyze, createDraft, scrapeWebsite } from '../utils/api';
 
 // Define types for batch email processing
 interface BatchEmail {
@@ -534,6 +534,19 @@ const BatchEmailProcessor = () => {
         `${domain}: ${domainGroups[domain].length} emails`
       ));
       
+      // Analyze every domain server-side up front so analyses run concurrently
+      const prefetchedResults: { [domain: string]: any } = {};
+      try {
+        await batchAnalyze(Object.keys(domainGroups), result => {
+          // Key by the domains as sent; the server normalizes them (www., scheme, case)
+          result.inputs.forEach(input => {
+            prefetchedResults[input] = result;
+          });
+        });
+      } catch (batchError) {
+        console.warn('Batch analysis failed, falling back to per-domain analysis:', batchError);
+      }
+      
       // Process each domain once
       for (const domain of Object.keys(domainGroups)) {
         console.log(`Processing domain: ${domain} with ${domainGroups[domain].length} emails`);
@@ -551,7 +564,7 @@ const BatchEmailProcessor = () => {
         let scrapeResult;
         try {
           console.log(`Scraping website for domain: ${domain}`);
-          scrapeResult = await scrapeWebsite(domain);
+          scrapeResult = prefetchedResults[domain] || await scrapeWebsite(domain);
           console.log(`Scrape result for ${domain}:`, scrapeResult);
           
           // Store domain data for all emails with this domain
@@ -29,6 +29,18 @@ interface AIContentResponse {
   error?: string;
 }
 
+interface AIContentBatchRequest {
+  placeholders: string[];
+  recipient_email: string;
+  template_name: string;
+}
+
+interface AIContentBatchResponse {
+  success: boolean;
+  contents?: Record<string, string>;
+  error?: string;
+}
+
 interface WebScrapingRequest {
   domain: string;
 }
@@ -51,18 +63,49 @@ interface WebScrapingResponse {
   achievements: string;
 }
 
+interface BatchAnalyzeResult extends WebScrapingResponse {
+  domain: string;
+  // The requested domains, as sent, that normalized to `domain`
+  inputs: string[];
+}
+
 interface RefineEmailRequest {
   subject: string;
   body: string;
   recipient_email: string;
   industry?: string;
   company_name?: string;
+  force?: boolean;
+}
+
+interface CampaignJobRequest {
+  recipient_emails: string[];
+  subject: string;
+  body: string;
+  user_name: string;
+  user_company: string;
+  create_drafts?: boolean;
+  refine?: boolean;
+}
+
+interface CampaignJobEvent {
+  id: number;
+  type: 'job_started' | 'job_resumed' | 'stage' | 'job_finished';
+  at: number;
+  domain?: string;
+  stage?: 'scraped' | 'analyzed' | 'rendered' | 'refined' | 'drafted';
+  status?: string;
+  elapsed_ms?: number;
+  error?: string;
+  [key: string]: any;
 }
 
 interface RefineEmailResponse {
   success: boolean;
   subject?: string;
   body?: string;
+  refined?: boolean;
+  issues?: string[];
   error?: string;
 }
 
@@ -121,6 +164,42 @@ export const generateAIContent = async (requestData: AIContentRequest): Promise<
   }
 };
 
+// Fills every placeholder of a template with one request instead of one per placeholder
+export const generateAIContentBatch = async (requestData: AIContentBatchRequest): Promise<AIContentBatchResponse> => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/generate-ai-content/batch`, requestData);
+    
+    return {
+      success: true,
+      contents: response.data.contents
+    };
+  } catch (error: any) {
+    console.error('Error generating AI content:', error);
+    return {
+      success: false,
+      error: error.response?.data?.detail || 'Failed to generate AI content'
+    };
+  }
+};
+
+const toWebScrapingResponse = (data: any): WebScrapingResponse => ({
+    success: Boolean(data.success),
+    error: data.success ? undefined : data.error,
+    company_name: data.searchData?.company_name || '',
+    industry: data.searchData?.industry || '',
+    business_focus: data.searchData?.business_focus || '',
+    description: data.searchData?.description || '',
+    key_achievements: data.searchData?.key_achievements || '',
+    values: data.searchData?.values || '',
+    market_position: data.searchData?.market_position || '',
+    products_summary: data.searchData?.products_summary || '',
+    ai_enhanced: Boolean(data.success),
+    design_focus: data.searchData?.design_focus || '',
+    dev_focus: data.searchData?.development_focus || '',
+    ai_focus: data.searchData?.ai_integration_focus || '',
+    achievements: data.searchData?.key_achievements || ''
+});
+
 export async function scrapeWebsite(domain: string): Promise<WebScrapingResponse> {
     try {
         const response = await fetch(`${API_BASE_URL}/scrape-website`, {
@@ -138,22 +217,7 @@ export async function scrapeWebsite(domain: string): Promise<WebScrapingResponse
         }
 
         // The backend now returns structured data directly
-        return {
-            success: true,
-            company_name: data.searchData.company_name || '',
-            industry: data.searchData.industry || '',
-            business_focus: data.searchData.business_focus || '',
-            description: data.searchData.description || '',
-            key_achievements: data.searchData.key_achievements || '',
-            values: data.searchData.values || '',
-            market_position: data.searchData.market_position || '',
-            products_summary: data.searchData.products_summary || '',
-            ai_enhanced: true,
-            design_focus: data.searchData.design_focus || '',
-            dev_focus: data.searchData.development_focus || '',
-            ai_focus: data.searchData.ai_integration_focus || '',
-            achievements: data.searchData.key_achievements || ''
-        };
+        return toWebScrapingResponse(data);
     } catch (error) {
         console.error('Error performing web search:', error);
         return {
@@ -176,12 +240,56 @@ export async function scrapeWebsite(domain: string): Promise<WebScrapingResponse
     }
 }
 
+// Analyzes many domains server-side; onResult is called as each domain finishes
+export async function batchAnalyze(
+    domains: string[],
+    onResult: (result: BatchAnalyzeResult) => void,
+    concurrency?: number
+): Promise<void> {
+    const response = await fetch(`${API_BASE_URL}/batch/analyze`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ domains, concurrency }),
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Batch analysis failed with status ${response.status}`);
+    }
+
+    // Results arrive as newline-delimited JSON in completion order
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() || '';
+
+        lines.filter(line => line.trim()).forEach(line => {
+            const data = JSON.parse(line);
+            onResult({ domain: data.domain, inputs: data.inputs || [], ...toWebScrapingResponse(data) });
+        });
+    }
+
+    if (buffered.trim()) {
+        const data = JSON.parse(buffered);
+        onResult({ domain: data.domain, inputs: data.inputs || [], ...toWebScrapingResponse(data) });
+    }
+}
+
 export const refineEmailContent = async ({
   subject,
   body,
   recipient_email,
   industry,
-  company_name
+  company_name,
+  force
 }: RefineEmailRequest): Promise<RefineEmailResponse> => {
   try {
     const response = await axios.post(`${API_BASE_URL}/refine-email`, {
@@ -189,13 +297,16 @@ export const refineEmailContent = async ({
       body,
       recipient_email,
       industry: industry || '',
-      company_name: company_name || ''
+      company_name: company_name || '',
+      force: force || false
     });
     
     return {
       success: true,
       subject: response.data.subject,
-      body: response.data.body
+      body: response.data.body,
+      refined: response.data.refined,
+      issues: response.data.issues
     };
   } catch (error: any) {
     console.error('Error refining email:', error);
@@ -204,4 +315,27 @@ export const refineEmailContent = async ({
       error: error.response?.data?.detail || 'Failed to refine email'
     };
   }
-}; 
\ No newline at end of file
+}; 
+
+// Starts a batch campaign on the server; progress is followed with watchCampaignJob
+export const startCampaignJob = async (request: CampaignJobRequest) => {
+  const response = await axios.post(`${API_BASE_URL}/jobs`, request);
+  return response.data;
+};
+
+// Follows a campaign job's stage events; EventSource resumes with Last-Event-ID after reconnects
+export function watchCampaignJob(
+    jobId: string,
+    onEvent: (event: CampaignJobEvent) => void
+): () => void {
+    const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+    const handle = (message: MessageEvent) => {
+        const event: CampaignJobEvent = JSON.parse(message.data);
+        onEvent(event);
+        if (event.type === 'job_finished') {
+            source.close();
+        }
+    };
+    ['job_started', 'job_resumed', 'stage', 'job_finished'].forEach(type => source.addEventListener(type, handle));
+    return () => source.close();
+}